@@ -187,24 +187,36 @@ export default function usePhotobooth() {
             .catch(() => { })
     }, [startPolling])
 
-    // Heartbeat: poll every 2s when idle to detect joystick-triggered captures
+    // Heartbeat: long-poll status when idle to detect joystick-triggered captures
+    // (?since= returns as soon as the server's status version changes)
     useEffect(() => {
         if (isCapturing) return
 
-        const interval = setInterval(async () => {
-            try {
-                const r = await fetch('/api/status')
-                const data = await r.json()
-                if (data.in_progress) {
-                    setIsCapturing(true)
-                    startPolling()
+        const controller = new AbortController()
+        let version = null
+
+        const watch = async () => {
+            while (!controller.signal.aborted) {
+                try {
+                    const query = version === null ? '' : `?since=${version}`
+                    const r = await fetch(`/api/status${query}`, { signal: controller.signal })
+                    const data = await r.json()
+                    if (data.in_progress) {
+                        setIsCapturing(true)
+                        startPolling()
+                        return
+                    }
+                    version = data.version
+                } catch {
+                    // ignore network errors, but don't spin while the server is down
+                    if (controller.signal.aborted) return
+                    await new Promise((resolve) => setTimeout(resolve, 2000))
                 }
-            } catch {
-                // ignore network errors
             }
-        }, 2000)
+        }
+        watch()
 
-        return () => clearInterval(interval)
+        return () => controller.abort()
     }, [isCapturing, startPolling])
 
     return {
@@ -1,8 +1,16 @@
 """
 Joystick Controller for Photobooth
 Reads a USB joystick (DragonRise Inc.) via hidapi and triggers photo captures.
+On Linux the /dev/hidraw* node is read directly through an epoll selector,
+and reconnects wait on udev hotplug events instead of polling.
 """
 
+import errno
+import glob
+import os
+import selectors
+import socket
+import sys
 import threading
 import time
 
@@ -16,9 +24,100 @@ BUTTON_BYTE = 5
 BUTTON_MASK = 0xF0  # upper nibble only; lower nibble is hat switch
 K1_BIT = 4  # Single Photo  (0x0f → 0x1f)
 K2_BIT = 5  # Photo Strip   (0x0f → 0x2f)
+K1_MASK = 1 << K1_BIT
+K2_MASK = 1 << K2_BIT
+ANY_MASK = K1_MASK | K2_MASK  # buttons we actually dispatch on
+BUTTON_MASKS = (K1_MASK, K2_MASK)
 
-DEBOUNCE_SECONDS = 2.0
-RECONNECT_INTERVAL = 3.0
+# Timings in nanoseconds, compared against time.monotonic_ns()
+BOUNCE_LOCK_NS = 10_000_000       # ignore a button for 10 ms after it fires
+RELEASE_STABLE_NS = 5_000_000     # ...and until it has been up for 5 ms
+UI_COOLDOWN_NS = 2_000_000_000    # minimum gap between photo triggers
+RECONNECT_INTERVAL = 3.0  # reconnect poll when hotplug events are unavailable
+HOTPLUG_RESCAN_INTERVAL = 30.0  # safety-net rescan while waiting on hotplug
+READ_TIMEOUT_MS = 50  # caps how long stop() waits on a blocked read
+
+HIDRAW_SYSFS = "/sys/class/hidraw"
+
+# Netlink uevent multicast groups: 1 = raw kernel events, 2 = udev events
+# (sent after udev rules have applied permissions)
+NETLINK_KOBJECT_UEVENT = 15
+UEVENT_GROUPS = 1 | 2
+
+
+def _find_hidraw(vendor_id, product_id):
+    """Return the /dev/hidraw* path for a USB HID device, or None."""
+    # uevent carries e.g. "HID_ID=0003:00000079:00000006" (bus:vendor:product)
+    wanted = f"{vendor_id:08X}:{product_id:08X}"
+    for node in sorted(glob.glob(os.path.join(HIDRAW_SYSFS, "hidraw*"))):
+        try:
+            with open(os.path.join(node, "device", "uevent")) as f:
+                for line in f:
+                    if line.startswith("HID_ID=") and line.strip().upper().endswith(wanted):
+                        return os.path.join("/dev", os.path.basename(node))
+        except OSError:
+            continue
+    return None
+
+
+class _HidrawDevice:
+    """Minimal hidapi-compatible reader over a Linux hidraw fd.
+
+    read() blocks in epoll (outside the GIL) until a report is ready,
+    so the joystick thread costs nothing while idle.
+    """
+
+    def __init__(self, path):
+        self._fd = os.open(path, os.O_RDONLY | os.O_NONBLOCK)
+        self._selector = selectors.DefaultSelector()
+        self._selector.register(self._fd, selectors.EVENT_READ)
+
+    def read(self, max_length, timeout_ms=0):
+        if not self._selector.select(timeout=timeout_ms / 1000):
+            return []
+        try:
+            return list(os.read(self._fd, max_length))
+        except BlockingIOError:
+            return []
+
+    def close(self):
+        self._selector.close()
+        os.close(self._fd)
+
+
+class _HotplugMonitor:
+    """Wakes the joystick thread when a hidraw device is added (Linux only)."""
+
+    def __init__(self):
+        self._sock = socket.socket(socket.AF_NETLINK, socket.SOCK_DGRAM,
+                                   NETLINK_KOBJECT_UEVENT)
+        self._sock.bind((0, UEVENT_GROUPS))
+        self._sock.setblocking(False)
+        self._selector = selectors.DefaultSelector()
+        self._selector.register(self._sock, selectors.EVENT_READ)
+
+    def wait(self, timeout):
+        """Return True if a hidraw "add" event arrived within timeout seconds."""
+        if not self._selector.select(timeout=timeout):
+            return False
+        added = False
+        while True:
+            try:
+                msg = self._sock.recv(8192)
+            except BlockingIOError:
+                return added
+            except OSError as e:
+                # Nothing reads the socket while the joystick is connected, so
+                # the kernel may have dropped events: rescan to be safe
+                if e.errno == errno.ENOBUFS:
+                    return True
+                raise
+            if b"ACTION=add" in msg and b"SUBSYSTEM=hidraw" in msg:
+                added = True
+
+    def close(self):
+        self._selector.close()
+        self._sock.close()
 
 
 class JoystickController:
@@ -27,11 +126,21 @@ class JoystickController:
         self.on_photo_strip = on_photo_strip
         self._device = None
         self._running = False
-        self._last_press_time = 0
-        self._prev_buttons = 0  # previous button state for edge detection
+        self._last_press_ns = 0
+        # Eager-debounce state (see _handle_buttons)
+        self._locked = 0          # buttons that fired and haven't settled up
+        self._lock_until_ns = {mask: 0 for mask in BUTTON_MASKS}
+        self._released_ns = {}    # mask -> when a locked button went up
         self._connected = False
         self._lock = threading.Lock()
 
+        self._hotplug = None
+        if sys.platform.startswith("linux"):
+            try:
+                self._hotplug = _HotplugMonitor()
+            except OSError:
+                pass  # fall back to polling every RECONNECT_INTERVAL
+
         self._thread = threading.Thread(target=self._run, daemon=True)
         self._running = True
         self._thread.start()
@@ -44,10 +153,19 @@ class JoystickController:
     def _connect(self):
         """Try to open the HID device. Returns True on success."""
         try:
-            import hid
-            device = hid.device()
-            device.open(VENDOR_ID, PRODUCT_ID)
-            device.set_nonblocking(True)
+            path = _find_hidraw(VENDOR_ID, PRODUCT_ID) if sys.platform.startswith("linux") else None
+            device = None
+            if path:
+                try:
+                    device = _HidrawDevice(path)
+                except OSError:
+                    # e.g. EACCES before udev has applied permissions
+                    pass
+            if device is None:
+                # macOS / no usable hidraw node: fall back to hidapi
+                import hid
+                device = hid.device()
+                device.open(VENDOR_ID, PRODUCT_ID)
             self._device = device
             with self._lock:
                 self._connected = True
@@ -70,52 +188,94 @@ class JoystickController:
         with self._lock:
             self._connected = False
 
+    def _wait_for_device(self):
+        """Sleep until the joystick may have been plugged in."""
+        if self._hotplug is None:
+            time.sleep(RECONNECT_INTERVAL)
+            return
+        deadline = time.monotonic() + HOTPLUG_RESCAN_INTERVAL
+        while self._running and time.monotonic() < deadline:
+            if self._hotplug.wait(timeout=1.0):
+                return
+
     def _run(self):
         """Main loop: connect, read, handle buttons, reconnect on failure."""
         while self._running:
             if not self._device:
                 if not self._connect():
-                    time.sleep(RECONNECT_INTERVAL)
+                    self._wait_for_device()
                     continue
 
             try:
-                data = self._device.read(64)
-                if data and len(data) > BUTTON_BYTE:
-                    self._handle_report(data)
-                else:
-                    # No data available (non-blocking), short sleep to avoid busy-wait
-                    time.sleep(0.01)
+                # Block until a report arrives (or timeout), then drain any
+                # queued reports, OR-ing their button bytes as we go.
+                combined = last = None
+                data = self._device.read(64, timeout_ms=READ_TIMEOUT_MS)
+                while data:
+                    if len(data) > BUTTON_BYTE:
+                        last = data[BUTTON_BYTE]
+                        combined = last if combined is None else combined | last
+                    data = self._device.read(64, timeout_ms=1)
+                if last is not None:
+                    self._handle_buttons(combined, last)
             except Exception:
                 # Device disconnected or read error
                 print("🕹️  Joystick disconnected")
                 self._disconnect()
-                self._prev_buttons = 0
-                time.sleep(RECONNECT_INTERVAL)
+                self._locked = 0
+                self._released_ns.clear()
+                self._wait_for_device()
+
+        if self._hotplug:
+            self._hotplug.close()
+
+    def _handle_buttons(self, combined, last):
+        """Process one drained batch of reports, fire callbacks on presses.
+
+        `combined` is the OR of every report's button byte and `last` the
+        newest one, so a short press already released by the last report is
+        not lost.
+
+        Eager debounce: a press fires immediately, then that button is locked
+        until it has been released for RELEASE_STABLE_NS and BOUNCE_LOCK_NS has
+        passed, so contact bounce can't re-trigger it. Rate limiting photos is
+        a separate concern handled by UI_COOLDOWN_NS.
+        """
+        now_ns = time.monotonic_ns()
+
+        for mask in BUTTON_MASKS:
+            if not self._locked & mask:
+                continue
+            released_ns = self._released_ns.get(mask)
+            if (released_ns is not None
+                    and now_ns - released_ns >= RELEASE_STABLE_NS
+                    and now_ns >= self._lock_until_ns[mask]):
+                self._locked &= ~mask
 
-    def _handle_report(self, data):
-        """Process a HID report, fire callbacks on button press edges."""
-        # Mask to upper nibble only (ignore hat switch in lower nibble)
-        buttons = data[BUTTON_BYTE] & BUTTON_MASK
-        prev = self._prev_buttons
-        self._prev_buttons = buttons
+        pressed = combined & ANY_MASK & ~self._locked
 
-        # Edge detection: bits that just went from 0 to 1
-        rising = buttons & ~prev
+        for mask in BUTTON_MASKS:
+            if pressed & mask:
+                self._locked |= mask
+                self._lock_until_ns[mask] = now_ns + BOUNCE_LOCK_NS
+            if last & mask:
+                self._released_ns.pop(mask, None)
+            elif self._locked & mask and mask not in self._released_ns:
+                self._released_ns[mask] = now_ns
 
-        if not rising:
+        if not pressed:
             return
 
-        now = time.time()
-        if now - self._last_press_time < DEBOUNCE_SECONDS:
+        if now_ns - self._last_press_ns < UI_COOLDOWN_NS:
             return
 
-        if rising & (1 << K1_BIT):
-            self._last_press_time = now
+        if pressed & K1_MASK:
+            self._last_press_ns = now_ns
             print("🕹️  K1 pressed → Single Photo")
             if self.on_single_photo:
                 self.on_single_photo()
-        elif rising & (1 << K2_BIT):
-            self._last_press_time = now
+        elif pressed & K2_MASK:
+            self._last_press_ns = now_ns
             print("🕹️  K2 pressed → Photo Strip")
             if self.on_photo_strip:
                 self.on_photo_strip()
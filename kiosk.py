@@ -4,10 +4,14 @@ Fullscreen OpenCV display with joystick-only input.
 Mutually exclusive with the web server (server.py).
 """
 
+import functools
+import multiprocessing
 import os
+import queue
 import sys
 import time
 import threading
+from concurrent.futures import ProcessPoolExecutor
 import numpy as np
 
 # Set library path for libusb on macOS (Homebrew)
@@ -17,7 +21,8 @@ if sys.platform == "darwin":
         os.environ["DYLD_LIBRARY_PATH"] = homebrew_lib + ":" + os.environ.get("DYLD_LIBRARY_PATH", "")
 
 import cv2
-from photobooth import PhotoboothCamera, process_for_thermal, print_photo, create_photo_strip
+from photobooth import (PhotoboothCamera, process_for_thermal, print_photo, create_photo_strip,
+                        open_printer_async)
 
 # ── State constants ──
 IDLE = "IDLE"
@@ -35,9 +40,31 @@ REVIEW_DURATION = 4
 STRIP_GAP_DURATION = 2
 STRIP_NUM_PHOTOS = 3
 
+# ── Display loop waitKey timeouts (ms) ──
+FRAME_WAIT_MS = 16  # ~60 FPS while something is animating
+IDLE_WAIT_MS = 5    # IDLE is the live preview; favour joystick responsiveness
+ACTION_WAIT_MS = 1  # an action is pending — get to _tick() right away
+STATIC_WAIT_MS = 50  # static screen already on display; only timers to check
+
+# States whose display frame only changes on state transitions
+STATIC_STATES = (FLASH, REVIEW, PRINTING)
+
 WINDOW_NAME = "Photobooth"
 
 
+@functools.lru_cache(maxsize=64)
+def _text_size(text, font, font_scale, thickness):
+    """Cached cv2.getTextSize — overlay strings are few and mostly static."""
+    return cv2.getTextSize(text, font, font_scale, thickness)[0]
+
+
+def _print_worker(image_path, is_strip):
+    """Thermal-process and print in the print pool's worker process."""
+    printer = open_printer_async()  # USB handshake overlaps the processing
+    thermal = process_for_thermal(image_path, is_strip=is_strip)
+    print_photo(thermal, printer=printer)
+
+
 class KioskApp:
     def __init__(self):
         # Camera (headless — we manage our own OpenCV window)
@@ -49,15 +76,35 @@ class KioskApp:
         self.is_strip = False
         self.strip_photo_index = 0
         self.strip_paths = []
+        self.strip_frames = []  # in-memory BGR shots, parallel to strip_paths
         self.countdown_number = COUNTDOWN_SECONDS
         self.review_image = None
-
-        # Joystick thread-safe action queue
-        self._pending_action = None
-        self._action_lock = threading.Lock()
+        self._review_canvas = None    # review_image composited once per review
+        self._printing_canvas = None  # _review_canvas + "Printing..." banner
+        self._flip_buf = None         # reused cv2.flip destination
+        self._resize_dst = None       # reused review resize destination
+        self._fit_canvas = None       # reused letterboxed preview canvas
+        self._fit_key = None          # frame shape the canvas geometry is for
+        self._fit_box = None          # (x, y, w, h) of the frame inside it
+
+        # Joystick thread-safe action slot: holds at most one pending press
+        # so presses during a session don't replay as extra sessions later
+        self._actions = queue.Queue(maxsize=1)
+
+        # Set on state transitions; static states are only redrawn when set
+        self._dirty = True
+        # What the live states last put on screen: the camera frame seq and
+        # the countdown digit. Unchanged means the blit would be identical.
+        self._last_rendered_frame_id = None
+        self._last_rendered_digit = None
 
         # Printing
         self._print_done = False
+        # Thermal processing holds the GIL for long stretches, so run it in a
+        # separate interpreter to keep the display loop smooth. "spawn" avoids
+        # forking a process that owns camera threads and an X11 connection.
+        self._print_pool = ProcessPoolExecutor(
+            max_workers=1, mp_context=multiprocessing.get_context("spawn"))
 
         # Wait for X11 display to be available (matters on boot)
         self._wait_for_display()
@@ -66,15 +113,48 @@ class KioskApp:
         self.screen_w, self.screen_h = self._detect_screen_size()
         self._scale = self.screen_h / 1080
 
-        # Window — force fullscreen by positioning and resizing explicitly
-        cv2.namedWindow(WINDOW_NAME, cv2.WINDOW_NORMAL)
+        # Pre-allocated full-screen frames (avoid a 6 MB alloc per tick)
+        self._flash_frame = np.full((self.screen_h, self.screen_w, 3), 255, dtype=np.uint8)
+        self._blank_frame = np.zeros_like(self._flash_frame)
+        self._waiting_frame = self._blank_frame.copy()
+        self._draw_text_centered(self._waiting_frame, "Waiting for camera...", 0.5,
+                                 max(0.5, 1.5 * self._scale))
+        self._processing_frame = self._blank_frame.copy()
+        self._draw_text_centered(self._processing_frame, "Processing...", 0.5,
+                                 max(0.5, 2.0 * self._scale))
+
+        # Countdown digits never change, so rasterize each one once
+        self._countdown_glyphs = {
+            n: self._prerender_text(str(n), 0.45, max(1.0, 8.0 * self._scale),
+                                    color=(0, 255, 255),
+                                    thickness=max(2, int(12 * self._scale)))
+            for n in range(1, COUNTDOWN_SECONDS + 1)
+        }
+
+        # Window — force fullscreen by positioning and resizing explicitly.
+        # Prefer an OpenGL window so presenting frames happens on the GPU;
+        # OpenCV builds without OpenGL raise, so fall back to a plain one.
+        try:
+            cv2.namedWindow(WINDOW_NAME, cv2.WINDOW_NORMAL | cv2.WINDOW_OPENGL)
+        except cv2.error:
+            cv2.namedWindow(WINDOW_NAME, cv2.WINDOW_NORMAL)
         cv2.setWindowProperty(WINDOW_NAME, cv2.WND_PROP_FULLSCREEN, cv2.WINDOW_FULLSCREEN)
         cv2.moveWindow(WINDOW_NAME, 0, 0)
         cv2.resizeWindow(WINDOW_NAME, self.screen_w, self.screen_h)
         # Show a blank frame so the window manager registers the window
-        cv2.imshow(WINDOW_NAME, np.zeros((self.screen_h, self.screen_w, 3), dtype=np.uint8))
+        cv2.imshow(WINDOW_NAME, self._blank_frame)
         cv2.waitKey(100)
-        self._force_fullscreen()
+        # Window decoration tweaks don't need to block camera/joystick startup
+        threading.Thread(target=self._force_fullscreen, daemon=True).start()
+
+        # Camera consumer thread: keeps the newest frame in _latest_frame so the
+        # display loop never blocks on the camera. A plain attribute swap is
+        # atomic under the GIL, so no lock is needed for one writer/one reader.
+        self._latest_frame = None
+        self._latest_seq = 0  # set after _latest_frame, so never ahead of it
+        self._cam_running = True
+        self._cam_thread = threading.Thread(target=self._cam_loop, daemon=True)
+        self._cam_thread.start()
 
         # Joystick
         self.joystick = None
@@ -102,29 +182,29 @@ class KioskApp:
         print("⚠️  Display not detected after timeout, continuing anyway")
 
     def _force_fullscreen(self):
-        """Use xdotool to remove decorations and force true fullscreen."""
-        try:
-            import subprocess
-            wid = subprocess.check_output(
-                ["xdotool", "search", "--name", WINDOW_NAME],
-                stderr=subprocess.DEVNULL, text=True
-            ).strip().splitlines()[0]
+        """Use xdotool to remove decorations and force true fullscreen.
+
+        All steps run as one xdotool script (one fork/exec) and `--sync`
+        replaces the fixed sleep between unmap and remap.
+        """
+        script = "\n".join([
+            f"search --name {WINDOW_NAME}",
             # Set override-redirect so the WM ignores this window (no title bar)
-            subprocess.run(["xdotool", "set_window", "--overrideredirect", "1", wid],
-                           stderr=subprocess.DEVNULL)
+            "set_window --overrideredirect 1 %1",
             # Unmap/remap so the flag takes effect
-            subprocess.run(["xdotool", "windowunmap", wid], stderr=subprocess.DEVNULL)
-            time.sleep(0.3)
-            subprocess.run(["xdotool", "windowmap", wid], stderr=subprocess.DEVNULL)
-            subprocess.run(["xdotool", "windowmove", wid, "0", "0"],
-                           stderr=subprocess.DEVNULL)
-            subprocess.run(["xdotool", "windowsize", wid,
-                            str(self.screen_w), str(self.screen_h)],
-                           stderr=subprocess.DEVNULL)
-            subprocess.run(["xdotool", "windowactivate", wid],
-                           stderr=subprocess.DEVNULL)
-            subprocess.run(["xdotool", "windowfocus", wid],
-                           stderr=subprocess.DEVNULL)
+            "windowunmap --sync %1",
+            "windowmap --sync %1",
+            "windowmove %1 0 0",
+            f"windowsize %1 {self.screen_w} {self.screen_h}",
+            "windowactivate %1",
+            "windowfocus %1",
+        ]) + "\n"
+        try:
+            import subprocess
+            result = subprocess.run(["xdotool", "-"], input=script, text=True,
+                                    stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+            if result.returncode != 0:
+                raise RuntimeError(result.stderr.strip() or f"xdotool exited {result.returncode}")
         except Exception as e:
             print(f"⚠️  Could not force fullscreen: {e}")
 
@@ -145,6 +225,14 @@ class KioskApp:
             pass
         return 1920, 1080
 
+    def _cam_loop(self):
+        seq = 0
+        while self._cam_running:
+            seq, frame = self.camera.wait_frame(seq, timeout=0.5)
+            if frame is not None:
+                self._latest_frame = frame
+                self._latest_seq = seq
+
     def _init_joystick(self):
         try:
             from joystick import JoystickController
@@ -157,19 +245,22 @@ class KioskApp:
             print(f"🕹️  Joystick not available: {e}")
 
     def _queue_action(self, action):
-        with self._action_lock:
-            self._pending_action = action
+        try:
+            self._actions.put_nowait(action)
+        except queue.Full:
+            pass  # one press is already pending
 
     def _pop_action(self):
-        with self._action_lock:
-            action = self._pending_action
-            self._pending_action = None
-            return action
+        try:
+            return self._actions.get_nowait()
+        except queue.Empty:
+            return None
 
     # ── State transitions ──
 
     def _enter_state(self, state):
         self.state = state
+        self._dirty = True
         self.state_start = time.time()
 
     def _elapsed(self):
@@ -179,38 +270,68 @@ class KioskApp:
         self.countdown_number = COUNTDOWN_SECONDS
         self._enter_state(COUNTDOWN)
 
+    def _start_flash(self):
+        """Enter FLASH and blit the pre-allocated white frame exactly once."""
+        self._enter_state(FLASH)
+        cv2.imshow(WINDOW_NAME, self._flash_frame)
+        self._dirty = False
+
     def _do_capture(self):
         """Grab a frame and save it. Runs in the main loop context."""
         self._enter_state(CAPTURE)
+        # Review and stitching work from camera.last_frame, so the JPEG is
+        # written in the background (behind review / the next countdown)
+        # instead of stalling the UI; _start_printing waits for it
         filepath = self.camera.capture(countdown=0,
-                                       filename_prefix="strip" if self.is_strip else "photo")
+                                       filename_prefix="strip" if self.is_strip else "photo",
+                                       background_save=True)
         return filepath
 
     def _start_printing(self, image_path, is_strip=False):
         self._print_done = False
+        if self._review_canvas is not None:
+            self._printing_canvas = self._review_canvas.copy()
+            self._draw_banner(self._printing_canvas, "Printing...", 0.9,
+                              max(0.4, 1.5 * self._scale))
         self._enter_state(PRINTING)
 
-        def _print_thread():
+        def _on_print_done(future):
             try:
-                thermal = process_for_thermal(image_path, is_strip=is_strip)
-                print_photo(thermal)
+                future.result()
             except Exception as e:
                 print(f"❌ Print error: {e}")
             finally:
                 self._print_done = True
 
-        threading.Thread(target=_print_thread, daemon=True).start()
+        try:
+            self.camera.wait_for_saves()  # the print worker reads image_path
+            future = self._print_pool.submit(_print_worker, image_path, is_strip)
+        except Exception as e:
+            print(f"❌ Print error: {e}")
+            self._print_done = True
+            return
+        future.add_done_callback(_on_print_done)
 
     def _fit_to_screen(self, frame):
         """Resize frame to fit screen while preserving aspect ratio (letterboxed)."""
-        fh, fw = frame.shape[:2]
-        scale = min(self.screen_w / fw, self.screen_h / fh)
-        new_w, new_h = int(fw * scale), int(fh * scale)
-        resized = cv2.resize(frame, (new_w, new_h))
-        canvas = np.zeros((self.screen_h, self.screen_w, 3), dtype=np.uint8)
-        x_off = (self.screen_w - new_w) // 2
-        y_off = (self.screen_h - new_h) // 2
-        canvas[y_off:y_off + new_h, x_off:x_off + new_w] = resized
+        if self._fit_key != frame.shape:
+            fh, fw = frame.shape[:2]
+            scale = min(self.screen_w / fw, self.screen_h / fh)
+            new_w, new_h = int(fw * scale), int(fh * scale)
+            x_off = (self.screen_w - new_w) // 2
+            y_off = (self.screen_h - new_h) // 2
+            self._fit_canvas = np.zeros((self.screen_h, self.screen_w, 3), dtype=np.uint8)
+            self._fit_box = (x_off, y_off, new_w, new_h)
+            self._fit_key = frame.shape
+        canvas = self._fit_canvas
+        x_off, y_off, new_w, new_h = self._fit_box
+        # Overlays may have been drawn onto the letterbox bars last frame
+        canvas[:y_off] = 0
+        canvas[y_off + new_h:] = 0
+        canvas[:, :x_off] = 0
+        canvas[:, x_off + new_w:] = 0
+        cv2.resize(frame, (new_w, new_h),
+                   dst=canvas[y_off:y_off + new_h, x_off:x_off + new_w])
         return canvas
 
     # ── Overlay helpers ──
@@ -221,28 +342,54 @@ class KioskApp:
         """Draw text centered horizontally at y_ratio (0.0-1.0) of frame height."""
         h, w = frame.shape[:2]
         font = cv2.FONT_HERSHEY_SIMPLEX
-        text_size = cv2.getTextSize(text, font, font_scale, thickness)[0]
+        text_size = _text_size(text, font, font_scale, thickness)
         x = (w - text_size[0]) // 2
         y = int(h * y_ratio) + text_size[1] // 2
         if shadow:
             cv2.putText(frame, text, (x + 2, y + 2), font, font_scale, (0, 0, 0), thickness + 2)
         cv2.putText(frame, text, (x, y), font, font_scale, color, thickness)
 
+    def _prerender_text(self, text, y_ratio, font_scale, **kwargs):
+        """Rasterize _draw_text_centered output for a screen-sized frame.
+
+        Returns (x, y, glyph, transmit) for _blit_text. Drawing onto a black and
+        a white canvas gives the premultiplied glyph (the black render) and how
+        much background shows through each pixel (white - black), which keeps
+        the shadow and anti-aliased edges exact.
+        """
+        black = np.zeros_like(self._blank_frame)
+        white = np.full_like(self._blank_frame, 255)
+        self._draw_text_centered(black, text, y_ratio, font_scale, **kwargs)
+        self._draw_text_centered(white, text, y_ratio, font_scale, **kwargs)
+        transmit = cv2.subtract(white, black)
+        x, y, w, h = cv2.boundingRect((transmit < 255).any(axis=2).astype(np.uint8))
+        return x, y, black[y:y + h, x:x + w].copy(), transmit[y:y + h, x:x + w].copy()
+
+    @staticmethod
+    def _blit_text(frame, rendered):
+        """Composite a _prerender_text result onto a screen-sized frame in place."""
+        x, y, glyph, transmit = rendered
+        h, w = glyph.shape[:2]
+        roi = frame[y:y + h, x:x + w]
+        cv2.multiply(roi, transmit, dst=roi, scale=1 / 255)
+        cv2.add(roi, glyph, dst=roi)
+
     @staticmethod
     def _draw_banner(frame, text, y_ratio, font_scale=1.2, color=(255, 255, 255)):
         """Draw text on a semi-transparent dark banner."""
         h, w = frame.shape[:2]
         font = cv2.FONT_HERSHEY_SIMPLEX
         thickness = 2
-        text_size = cv2.getTextSize(text, font, font_scale, thickness)[0]
+        text_size = _text_size(text, font, font_scale, thickness)
 
         banner_h = text_size[1] + max(10, int(40 * h / 1080))
         y_top = int(h * y_ratio) - banner_h // 2
         y_top = max(0, min(y_top, h - banner_h))
 
-        overlay = frame.copy()
-        cv2.rectangle(overlay, (0, y_top), (w, y_top + banner_h), (0, 0, 0), -1)
-        cv2.addWeighted(overlay, 0.6, frame, 0.4, 0, frame)
+        # Blending a black overlay at 0.6 is just scaling the banner rows by
+        # 0.4, so only touch that ROI instead of copying the whole frame.
+        roi = frame[y_top:y_top + banner_h]
+        cv2.convertScaleAbs(roi, dst=roi, alpha=0.4)
 
         x = (w - text_size[0]) // 2
         y = y_top + banner_h // 2 + text_size[1] // 2
@@ -258,11 +405,12 @@ class KioskApp:
 
         try:
             while True:
-                display = self._build_frame()
-                if display is not None:
-                    cv2.imshow(WINDOW_NAME, display)
+                if self._needs_redraw():
+                    display = self._build_frame()
+                    if display is not None:
+                        cv2.imshow(WINDOW_NAME, display)
 
-                key = cv2.waitKey(16) & 0xFF
+                key = cv2.waitKey(self._wait_ms()) & 0xFF
                 if key == 27:  # ESC
                     break
 
@@ -270,25 +418,58 @@ class KioskApp:
         finally:
             self._cleanup()
 
+    def _needs_redraw(self):
+        """False while the frame on screen is still current.
+
+        Static states redraw on state transitions only; live states also
+        when a new camera frame arrives or the countdown digit changes.
+        """
+        dirty = self._dirty
+        self._dirty = False
+        if self.state in STATIC_STATES:
+            return dirty
+        frame_id = self._latest_seq
+        digit = self._countdown_remaining() if self.state == COUNTDOWN else None
+        if (not dirty and frame_id == self._last_rendered_frame_id
+                and digit == self._last_rendered_digit):
+            return False
+        self._last_rendered_frame_id = frame_id
+        self._last_rendered_digit = digit
+        return True
+
+    def _wait_ms(self):
+        """waitKey timeout for this loop iteration."""
+        if self.state in (REVIEW, PRINTING) and not self._dirty:
+            return STATIC_WAIT_MS
+        if self.state != IDLE:
+            return FRAME_WAIT_MS
+        if not self._actions.empty():
+            return ACTION_WAIT_MS
+        return IDLE_WAIT_MS
+
+    def _countdown_remaining(self):
+        """Digit the countdown is showing (COUNTDOWN_SECONDS down to 1)."""
+        return max(1, COUNTDOWN_SECONDS - int(self._elapsed()))
+
     def _build_frame(self):
         """Compose the display frame based on current state."""
 
         if self.state == FLASH:
-            white = np.full((self.screen_h, self.screen_w, 3), 255, dtype=np.uint8)
-            return white
+            # Already shown once by _start_flash(); nothing changes until capture
+            return None
 
         if self.state == REVIEW or self.state == PRINTING:
             return self._build_review_frame()
 
         # All other states show live mirrored preview
-        frame = self.camera.get_frame()
+        frame = self._latest_frame
         if frame is None:
-            blank = np.zeros((self.screen_h, self.screen_w, 3), dtype=np.uint8)
-            self._draw_text_centered(blank, "Waiting for camera...", 0.5, max(0.5, 1.5 * self._scale))
-            return blank
+            return self._waiting_frame
 
         # Mirror for selfie view and fit to screen (preserving aspect ratio)
-        frame = cv2.flip(frame, 1)
+        if self._flip_buf is None or self._flip_buf.shape != frame.shape:
+            self._flip_buf = np.empty_like(frame)
+        frame = cv2.flip(frame, 1, dst=self._flip_buf)
         frame = self._fit_to_screen(frame)
         s = self._scale
 
@@ -296,12 +477,7 @@ class KioskApp:
             self._draw_banner(frame, "Press button to take a photo!", 0.85, max(0.4, 1.2 * s))
 
         elif self.state == COUNTDOWN:
-            elapsed = self._elapsed()
-            remaining = COUNTDOWN_SECONDS - int(elapsed)
-            if remaining < 1:
-                remaining = 1
-            self._draw_text_centered(frame, str(remaining), 0.45, max(1.0, 8.0 * s),
-                                     color=(0, 255, 255), thickness=max(2, int(12 * s)))
+            self._blit_text(frame, self._countdown_glyphs[self._countdown_remaining()])
             if self.is_strip:
                 label = f"Photo {self.strip_photo_index + 1}/{STRIP_NUM_PHOTOS}"
                 self._draw_banner(frame, label, 0.15, max(0.4, 1.0 * s))
@@ -318,12 +494,21 @@ class KioskApp:
 
     def _build_review_frame(self):
         """Show the captured photo centered on a dark background."""
-        if self.review_image is None:
-            blank = np.zeros((self.screen_h, self.screen_w, 3), dtype=np.uint8)
-            self._draw_text_centered(blank, "Processing...", 0.5, max(0.5, 2.0 * self._scale))
-            return blank
-
-        review = self.review_image
+        if self._review_canvas is None:
+            return self._processing_frame
+        if self.state == PRINTING and self._printing_canvas is not None:
+            return self._printing_canvas
+        return self._review_canvas
+
+    def _set_review_image(self, img):
+        """Store the review image and composite its canvas once."""
+        self.review_image = img
+        self._printing_canvas = None
+        if img is None:
+            self._review_canvas = None
+            return
+
+        review = img
         rh, rw = review.shape[:2]
 
         # Target display size: fit within screen
@@ -331,17 +516,17 @@ class KioskApp:
         scale = min(screen_w / rw, screen_h / rh) * 0.85
         new_w = int(rw * scale)
         new_h = int(rh * scale)
-        resized = cv2.resize(review, (new_w, new_h))
+        if self._resize_dst is None or self._resize_dst.shape[:2] != (new_h, new_w):
+            self._resize_dst = np.empty((new_h, new_w, 3), dtype=np.uint8)
+        # INTER_AREA: faster and sharper than INTER_LINEAR for large downscales
+        resized = cv2.resize(review, (new_w, new_h), dst=self._resize_dst,
+                             interpolation=cv2.INTER_AREA)
 
         canvas = np.zeros((screen_h, screen_w, 3), dtype=np.uint8)
         x_off = (screen_w - new_w) // 2
         y_off = (screen_h - new_h) // 2
         canvas[y_off:y_off + new_h, x_off:x_off + new_w] = resized
-
-        if self.state == PRINTING:
-            self._draw_banner(canvas, "Printing...", 0.9, max(0.4, 1.5 * self._scale))
-
-        return canvas
+        self._review_canvas = canvas
 
     def _tick(self):
         """Process state timeouts and pending actions."""
@@ -352,16 +537,18 @@ class KioskApp:
             if action == "single":
                 self.is_strip = False
                 self.strip_paths = []
+                self.strip_frames = []
                 self._start_countdown()
             elif action == "strip":
                 self.is_strip = True
                 self.strip_photo_index = 0
                 self.strip_paths = []
+                self.strip_frames = []
                 self._start_countdown()
 
         elif self.state == COUNTDOWN:
             if elapsed >= COUNTDOWN_SECONDS:
-                self._enter_state(FLASH)
+                self._start_flash()
 
         elif self.state == FLASH:
             if elapsed >= FLASH_DURATION:
@@ -369,6 +556,7 @@ class KioskApp:
                 if self.is_strip:
                     if filepath:
                         self.strip_paths.append(filepath)
+                        self.strip_frames.append(self.camera.last_frame)
                     self.strip_photo_index += 1
                     if self.strip_photo_index < STRIP_NUM_PHOTOS:
                         self._enter_state(STRIP_GAP)
@@ -397,29 +585,32 @@ class KioskApp:
     def _finish_single(self, filepath):
         """After single capture: load review image, enter REVIEW."""
         if filepath:
-            img = cv2.imread(filepath)
-            self.review_image = img
+            # Reuse the frame capture() just wrote instead of decoding it again
+            self._set_review_image(self.camera.last_frame)
             self._current_print_path = filepath
             self._current_is_strip = False
         else:
-            self.review_image = None
+            self._set_review_image(None)
             self._current_print_path = None
         self._enter_state(REVIEW)
 
     def _finish_strip(self):
         """After all strip photos captured: stitch, load review, enter REVIEW."""
         if self.strip_paths:
-            strip_path = create_photo_strip(self.strip_paths)
+            strip_path = create_photo_strip(self.strip_frames)
+            self.camera.wait_for_saves()
+            # Full-resolution shots aren't needed past stitching; don't keep
+            # them alive through review and printing
+            self.strip_frames = []
             if strip_path:
-                img = cv2.imread(strip_path)
-                self.review_image = img
+                self._set_review_image(cv2.imread(strip_path))
                 self._current_print_path = strip_path
                 self._current_is_strip = True
             else:
-                self.review_image = None
+                self._set_review_image(None)
                 self._current_print_path = None
         else:
-            self.review_image = None
+            self._set_review_image(None)
             self._current_print_path = None
         self._enter_state(REVIEW)
 
@@ -434,6 +625,9 @@ class KioskApp:
         print("Shutting down kiosk...")
         if self.joystick:
             self.joystick.stop()
+        self._print_pool.shutdown(wait=False, cancel_futures=True)
+        self._cam_running = False
+        self._cam_thread.join()
         self.camera.close()
         cv2.destroyAllWindows()
 
@@ -8,11 +8,12 @@ Supports:
 - Automatic detection of available camera
 """
 
+import functools
 import os
 import sys
 import time
 from datetime import datetime
-from PIL import Image
+import numpy as np
 
 # Set library path for libusb on macOS (Homebrew)
 if sys.platform == "darwin":
@@ -20,17 +21,31 @@ if sys.platform == "darwin":
     if os.path.exists(homebrew_lib):
         os.environ["DYLD_LIBRARY_PATH"] = homebrew_lib + ":" + os.environ.get("DYLD_LIBRARY_PATH", "")
 
-from escpos.printer import Usb
+# escpos (and pyusb under it) and PIL (the no-Numba dither fallback, and the
+# header-only size read in _read_gray) are imported on first use, so loading
+# this module doesn't pay for them up front.
 
 
 # RONGTA Printer settings (detected from your printer)
 VENDOR_ID = 0x0fe6
 PRODUCT_ID = 0x811e
 
+# Largest single USB bulk write when flushing a batched print job
+USB_MAX_TRANSFER = 1024 * 1024
+
 # Photo output directory
 PHOTOS_DIR = os.path.join(os.path.dirname(__file__), "photos")
 os.makedirs(PHOTOS_DIR, exist_ok=True)
 
+# Capture size when nothing shows a live preview (web server, --headless CLI).
+# 720p still gives the 576-dot print a full-resolution square crop, with
+# about half the per-frame bytes of 1080p.
+HEADLESS_CAPTURE_SIZE = (1280, 720)
+
+# JPEG settings for saved photos. 85 is visually indistinguishable from 95
+# after the 576 px thermal downscale but encodes faster at about half the size.
+JPEG_QUALITY = 85
+
 # Import Camera Libraries
 PICAMERA_AVAILABLE = False
 try:
@@ -44,27 +59,92 @@ OPENCV_AVAILABLE = False
 try:
     import cv2
     OPENCV_AVAILABLE = True
+    JPEG_PARAMS = [cv2.IMWRITE_JPEG_QUALITY, JPEG_QUALITY,
+                   cv2.IMWRITE_JPEG_OPTIMIZE, 1,
+                   cv2.IMWRITE_JPEG_PROGRESSIVE, 0]
+    # Debug previews only: favour encode speed over file size
+    PNG_PARAMS = [cv2.IMWRITE_PNG_COMPRESSION, 1]
 except ImportError:
     print("⚠️ OpenCV not available")
 
+# Optional: native Floyd-Steinberg kernel (falls back to PIL's dither)
+NUMBA_AVAILABLE = False
+try:
+    from numba import njit, prange
+    NUMBA_AVAILABLE = True
+except ImportError:
+    pass
+
 
 import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+
+# With no preview consumer waiting, the OpenCV thread still grabs every frame
+# but decodes at most one per this many seconds
+IDLE_DECODE_INTERVAL = 0.2
+
+
+def _write_file(path, data):
+    with open(path, "wb") as f:
+        f.write(data)
+
+
+def _has_huffman_tables(jpeg):
+    """True if an encoded JPEG buffer carries its own DHT segment.
+
+    Many UVC webcams omit the tables from MJPEG frames (decoders are expected
+    to assume the standard ones), and such files don't open everywhere.
+    """
+    data = memoryview(jpeg).cast("B")
+    header = bytes(data[:min(len(data), 4096)])
+    sos = header.find(b"\xff\xda")
+    return sos > 0 and header.find(b"\xff\xc4", 0, sos) >= 0
+
+
+def _readonly(frame):
+    """Zero-copy, read-only view of a shared frame.
+
+    Consumers that need to draw on it must .copy() first; writing raises
+    instead of silently corrupting the frame other threads are reading.
+    """
+    view = frame.view()
+    view.flags.writeable = False
+    return view
+
 
 class PhotoboothCamera:
-    def __init__(self, camera_type='auto', width=1920, height=1080, headless=False):
+    def __init__(self, camera_type='auto', width=1920, height=1080, headless=False,
+                 passthrough_mjpeg=False):
         self.width = width
         self.height = height
         self.headless = headless
-        self.camera_type = self._detect_camera(camera_type)
+        # OpenCV/V4L2 only: keep the webcam's MJPEG frames encoded and save
+        # them as-is, decoding just the captured shot (for callers that never
+        # display the feed)
+        self.passthrough_mjpeg = passthrough_mjpeg
         
         self.picam = None
         self.cap = None
+        self.camera_type = self._detect_camera(camera_type)
         
         # Threading support
         self.stopped = False
         self.lock = threading.Lock()
         self._frame = None
         self.thread = None
+        # Notified (under self.lock) whenever a new frame lands in _frame
+        self._frame_cond = threading.Condition(self.lock)
+        self._frame_seq = 0
+        self._frame_waiters = 0  # threads blocked in wait_frame/_next_frame
+        # Single writer for capture(background_save=True) JPEGs
+        self._saver = ThreadPoolExecutor(max_workers=1, thread_name_prefix="photo-save")
+        self._pending_saves = []
+
+        # BGR copy of the most recent capture() (matches what cv2.imread of
+        # the saved file would return), so callers can skip re-decoding it
+        self.last_frame = None
+        self.last_strip_frames = []  # BGR frames from the last capture_strip
+        self._white = None  # cached flash frame
         
         self._initialize_camera()
 
@@ -80,9 +160,9 @@ class PhotoboothCamera:
         else:  # auto
             if PICAMERA_AVAILABLE:
                 try:
-                    # quick check
-                    picam = Picamera2()
-                    picam.close()
+                    # quick check — keep the instance open so
+                    # _initialize_camera doesn't renegotiate the sensor
+                    self.picam = Picamera2()
                     print("📷 Detected: Pi Camera")
                     return 'picamera'
                 except:
@@ -98,7 +178,8 @@ class PhotoboothCamera:
         print(f"📷 Initializing {self.camera_type} camera ({self.width}x{self.height})...")
         
         if self.camera_type == 'picamera':
-            self.picam = Picamera2()
+            if self.picam is None:
+                self.picam = Picamera2()
             config = self.picam.create_still_configuration(
                 main={"size": (self.width, self.height), "format": "RGB888"},
                 buffer_count=2
@@ -116,14 +197,24 @@ class PhotoboothCamera:
             time.sleep(0.5)  # Wait for first frame
 
         elif self.camera_type == 'opencv':
-            self.cap = cv2.VideoCapture(0)
+            # Pick the native backend explicitly instead of letting OpenCV probe
+            backend = cv2.CAP_AVFOUNDATION if sys.platform == "darwin" else cv2.CAP_V4L2
+            self.cap = cv2.VideoCapture(0, backend)
             if not self.cap.isOpened():
                 raise RuntimeError("Could not open OpenCV camera")
             
+            # Keep only the newest frame queued in the driver (less preview lag)
+            if not self.cap.set(cv2.CAP_PROP_BUFFERSIZE, 1):
+                print("⚠️ Camera driver ignored CAP_PROP_BUFFERSIZE; frames may lag")
             fourcc = cv2.VideoWriter_fourcc(*'MJPG')
             self.cap.set(cv2.CAP_PROP_FOURCC, fourcc)
             self.cap.set(cv2.CAP_PROP_FRAME_WIDTH, self.width)
             self.cap.set(cv2.CAP_PROP_FRAME_HEIGHT, self.height)
+            # Raw buffers are only JPEGs if the driver actually took MJPG
+            if self.passthrough_mjpeg and (
+                    int(self.cap.get(cv2.CAP_PROP_FOURCC)) != fourcc
+                    or not self.cap.set(cv2.CAP_PROP_CONVERT_RGB, 0)):
+                self.passthrough_mjpeg = False  # backend decodes
             
             # Start background thread for OpenCV
             self.stopped = False
@@ -141,31 +232,111 @@ class PhotoboothCamera:
         """Background thread to continuously grab frames from PiCamera."""
         print("📷 PiCamera thread started")
         while not self.stopped:
+            # capture_array copies a full RGB frame out of the camera buffers;
+            # with nobody waiting, only refresh the held frame every
+            # IDLE_DECODE_INTERVAL (a waiter wakes us immediately)
+            with self._frame_cond:
+                self._frame_cond.wait_for(lambda: self._frame_waiters > 0 or self.stopped,
+                                          IDLE_DECODE_INTERVAL)
             try:
                 array = self.picam.capture_array("main")
                 if array is not None:
-                    with self.lock:
-                        self._frame = array
+                    self._publish_frame(array)
             except Exception:
                 time.sleep(0.1)
         print("📷 PiCamera thread stopped")
 
+    def _publish_frame(self, frame):
+        """Swap in a new frame from a background thread and wake waiters."""
+        with self._frame_cond:
+            self._frame = frame
+            self._frame_seq += 1
+            self._frame_cond.notify_all()
+
+    def _next_frame(self, timeout=0.2):
+        """Return the first frame published after this call, without copying.
+
+        The frame already held may predate the shutter moment by a full frame
+        period (or more if the driver queued frames). Falls back to it if no
+        newer frame arrives within timeout.
+        """
+        with self._frame_cond:
+            seq = self._frame_seq
+            self._frame_waiters += 1
+            self._frame_cond.notify_all()  # wake an idle _update_picamera
+            try:
+                self._frame_cond.wait_for(lambda: self._frame_seq > seq, timeout)
+            finally:
+                self._frame_waiters -= 1
+            return self._frame
+
     def get_frame(self):
-        """Return the latest frame (numpy array) or None."""
+        """Return the latest frame (read-only numpy view) or None.
+
+        The array is shared, not copied; .copy() it before drawing on it.
+        """
         with self.lock:
-            if self._frame is not None:
-                return self._frame.copy()
-        return None
+            frame = self._frame
+        if frame is None:
+            return None
+        if self.passthrough_mjpeg:
+            return self._decode(frame)
+        return _readonly(frame)
+
+    def wait_frame(self, after_seq=0, timeout=1.0):
+        """Block until a frame newer than after_seq arrives.
+
+        Returns (seq, frame) — pass seq back in on the next call. On timeout
+        returns (after_seq, None). The frame is a read-only view of the shared
+        array (the capture threads always publish a freshly allocated one and
+        never write into it): draw into your own buffer, not onto it.
+        """
+        with self._frame_cond:
+            self._frame_waiters += 1
+            self._frame_cond.notify_all()  # wake an idle _update_picamera
+            try:
+                if not self._frame_cond.wait_for(lambda: self._frame_seq > after_seq, timeout):
+                    return after_seq, None
+            finally:
+                self._frame_waiters -= 1
+            seq, frame = self._frame_seq, self._frame
+        if self.passthrough_mjpeg:
+            return seq, self._decode(frame)
+        return seq, _readonly(frame)
+
+    def _decode(self, jpeg):
+        """Decode a passthrough MJPEG buffer; on failure stop passing through."""
+        frame = cv2.imdecode(jpeg, cv2.IMREAD_COLOR)
+        if frame is None:
+            self._disable_passthrough()
+        return frame
+
+    def _disable_passthrough(self):
+        """Let the backend decode frames again (the stream isn't MJPEG)."""
+        if self.passthrough_mjpeg:
+            self.passthrough_mjpeg = False
+            self.cap.set(cv2.CAP_PROP_CONVERT_RGB, 1)
+            print("⚠️ Camera frames aren't MJPEG; falling back to decoded frames")
 
     def _update_opencv(self):
         """Background thread to continuously grab frames from OpenCV."""
         print("📷 Camera thread started")
+        last_decode = 0.0
         while not self.stopped:
             if self.cap and self.cap.isOpened():
-                ret, frame = self.cap.read()
+                # grab() every frame to keep the driver queue fresh, but only
+                # decode when someone is waiting for one (live preview,
+                # capture) or the held frame is getting old
+                ret = self.cap.grab()
                 if ret:
+                    now = time.monotonic()
                     with self.lock:
-                        self._frame = frame
+                        wanted = self._frame_waiters > 0
+                    if wanted or now - last_decode >= IDLE_DECODE_INTERVAL:
+                        ok, frame = self.cap.retrieve()
+                        if ok:
+                            last_decode = now
+                            self._publish_frame(frame)
                 else:
                     # If we lost the camera, maybe try to reconnect?
                     # For now just sleep a bit to avoid CPU spin
@@ -178,6 +349,7 @@ class PhotoboothCamera:
         self.stopped = True
         if self.thread:
             self.thread.join()
+        self._saver.shutdown(wait=True)
             
         if self.picam:
             self.picam.stop()
@@ -186,7 +358,31 @@ class PhotoboothCamera:
             self.cap.release()
             cv2.destroyAllWindows()
 
-    def capture(self, countdown=0, filename_prefix="photo"):
+    def _save_jpeg(self, filepath, frame, background, encoded=False):
+        """Write frame to filepath as a JPEG; encoded means it already is one."""
+        if encoded:
+            job = (_write_file, filepath, frame)
+        else:
+            job = (cv2.imwrite, filepath, frame, JPEG_PARAMS)
+        if background:
+            self._pending_saves.append(self._saver.submit(*job))
+        else:
+            job[0](*job[1:])
+
+    def wait_for_saves(self):
+        """Block until every background_save capture is on disk."""
+        pending, self._pending_saves = self._pending_saves, []
+        for future in pending:
+            future.result()
+
+    def capture(self, countdown=0, filename_prefix="photo", background_save=False):
+        """Snap a photo, save it to PHOTOS_DIR and return its path.
+
+        The BGR frame is kept in last_frame (possibly a read-only view of
+        the live frame; copy it before drawing on it). With background_save the JPEG is
+        encoded on a worker thread (e.g. behind the next strip countdown);
+        call wait_for_saves() before reading the file back.
+        """
         # Handle countdown (blocking, for sync)
         if countdown > 0:
             print(f"📷 Waiting {countdown}s...")
@@ -199,25 +395,35 @@ class PhotoboothCamera:
         filepath = os.path.join(PHOTOS_DIR, filename)
 
         if self.camera_type == 'picamera':
-            # Grab latest frame from background thread
-            frame = None
-            with self.lock:
-                if self._frame is not None:
-                    frame = self._frame.copy()
+            # Grab the first frame exposed after the shutter from the background thread
+            frame = self._next_frame()
 
             if frame is None:
                 print("❌ Failed to capture photo (no frame in buffer)")
                 return None
 
-            img = Image.fromarray(frame)
-            img.save(filepath, "JPEG", quality=95)
+            # One RGB -> BGR pass feeds both the JPEG and the in-memory
+            # pipeline (process_for_thermal / create_photo_strip)
+            self.last_frame = cv2.cvtColor(frame, cv2.COLOR_RGB2BGR)
+            self._save_jpeg(filepath, self.last_frame, background_save)
             
         elif self.camera_type == 'opencv':
-            # Grab latest frame from thread
-            frame = None
-            with self.lock:
-                if self._frame is not None:
-                    frame = self._frame.copy()
+            # Grab the first frame exposed after the shutter from the thread
+            frame = self._next_frame()
+            jpeg = None
+            if frame is not None and self.passthrough_mjpeg:
+                jpeg = frame
+                frame = self._decode(jpeg)
+                if frame is None:
+                    # Re-grab a backend-decoded frame; one raw buffer may
+                    # still have been retrieved before the switch
+                    jpeg = None
+                    for _ in range(2):
+                        frame = self._next_frame()
+                        if frame is None or frame.ndim == 3:
+                            break
+                    else:
+                        frame = None
             
             if frame is None:
                 print("❌ Failed to capture photo (no frame in buffer)")
@@ -226,19 +432,31 @@ class PhotoboothCamera:
             # Flash effect (optional, only if not headless)
             if not self.headless:
                 try:
-                    white = frame.copy()
-                    white[:] = (255, 255, 255)
-                    cv2.imshow("Photobooth", white)
+                    if self._white is None or self._white.shape != frame.shape:
+                        self._white = np.full_like(frame, 255)
+                    cv2.imshow("Photobooth", self._white)
                     cv2.waitKey(50)
                 except: pass
                 
-            cv2.imwrite(filepath, frame)
+            if jpeg is not None and _has_huffman_tables(jpeg):
+                # Save the camera's own JPEG: no re-encode, no generation loss
+                self._save_jpeg(filepath, jpeg, background_save, encoded=True)
+            else:
+                self._save_jpeg(filepath, frame, background_save)
+            # Shared with the preview thread unless it was decoded here
+            self.last_frame = frame if jpeg is not None else _readonly(frame)
             
         print(f"✅ Photo captured: {filepath}")
         return filepath
 
     def capture_strip(self, num_photos=3, countdown=3, gap=2):
+        """Capture num_photos shots and return their paths.
+
+        The matching BGR frames are kept in last_strip_frames, so
+        create_photo_strip can stitch without decoding the JPEGs again.
+        """
         photo_paths = []
+        self.last_strip_frames = []
         
         for i in range(num_photos):
             if i > 0:
@@ -247,110 +465,444 @@ class PhotoboothCamera:
                 
             print(f"\n📸 Strip Photo {i+1}/{num_photos}")
             # Ensure full countdown for every photo so users can prep
-            path = self.capture(countdown, filename_prefix="strip")
+            # Encode each JPEG behind the next gap/countdown
+            path = self.capture(countdown, filename_prefix="strip", background_save=True)
             if path:
                 photo_paths.append(path)
+                self.last_strip_frames.append(self.last_frame)
                 
+        self.wait_for_saves()
         return photo_paths
 
 
 # --- Logic for Processing & Printing (Stateless) ---
 
-def process_for_thermal(image_path, is_strip=False):
-    """Process an image for optimal thermal printer output."""
-    from PIL import ImageEnhance, ImageFilter
-    
-    img = Image.open(image_path)
-    thermal_width = 576
-    
+THERMAL_WIDTH = 576  # printer head width in dots
+THERMAL_CONTRAST = 1.2
+ESC = b"\x1b"
+ESC_STAR_DENSITY = 33  # 24-dot vertical, double horizontal density
+# Pillow's ImageFilter.SMOOTH kernel
+SMOOTH_KERNEL = np.array([[1, 1, 1],
+                          [1, 5, 1],
+                          [1, 1, 1]], dtype=np.float32) / 13
+THERMAL_KERNEL = SMOOTH_KERNEL * THERMAL_CONTRAST  # smooth, then contrast gain
+# Use the green channel as luminance: it carries most of it, and after 1-bit
+# dithering the difference from BT.601 gray is hard to see. Set False for
+# true weighted grayscale.
+FAST_GRAY = True
+STRIP_WHITE_ROW = 250  # min gray level of a strip spacer row (allows JPEG ringing)
+# "floyd-steinberg" (error diffusion, the default look) or "bayer" (ordered
+# dither: one vectorized compare, cross-hatch texture instead of grain)
+THERMAL_DITHER = "floyd-steinberg"
+
+
+def _bayer_matrix(n):
+    """Return the n x n (n a power of 2) Bayer index matrix, values 0..n*n-1."""
+    m = np.zeros((1, 1), dtype=np.int32)
+    while m.shape[0] < n:
+        m = np.block([[4 * m, 4 * m + 2],
+                      [4 * m + 3, 4 * m + 1]])
+    return m
+
+
+# Per-cell gray level below which a dot prints; 16x16 covers all of 0..255
+BAYER_THRESHOLDS = _bayer_matrix(16).astype(np.uint8)
+
+if NUMBA_AVAILABLE:
+    # Explicit signature: compiled eagerly at import (and cached to
+    # __pycache__), never on the first print. nogil lets the web server and
+    # kiosk threads keep running while a print dithers.
+    @njit("uint8[:, ::1](int16[:, ::1])", cache=True, nogil=True, boundscheck=False)
+    def _fs_dither(gray):
+        """Floyd-Steinberg dither an int16 grayscale array to a 0/1 dot mask.
+
+        Works in place on `gray` (it accumulates the diffused error). Integer
+        weights only (7/16, 3/16, 5/16, 1/16 as >> 4); the first/last column
+        and the last row are peeled off so the inner loop has no bounds checks.
+        """
+        h, w = gray.shape
+        out = np.empty((h, w), dtype=np.uint8)
+        for y in range(h - 1):
+            below = gray[y + 1]
+            # x == 0: nothing to the lower left
+            v = gray[y, 0]
+            new = 0 if v < 128 else 255
+            out[y, 0] = (255 - new) >> 7  # 1 = print a dot
+            e = v - new
+            gray[y, 1] += (7 * e) >> 4
+            below[0] += (5 * e) >> 4
+            below[1] += e >> 4
+            for x in range(1, w - 1):
+                v = gray[y, x]
+                new = 0 if v < 128 else 255
+                out[y, x] = (255 - new) >> 7
+                e = v - new
+                gray[y, x + 1] += (7 * e) >> 4
+                below[x - 1] += (3 * e) >> 4
+                below[x] += (5 * e) >> 4
+                below[x + 1] += e >> 4
+            # x == w - 1: nothing to the right
+            v = gray[y, w - 1]
+            new = 0 if v < 128 else 255
+            out[y, w - 1] = (255 - new) >> 7
+            e = v - new
+            below[w - 2] += (3 * e) >> 4
+            below[w - 1] += (5 * e) >> 4
+        # Last row only diffuses to the right
+        y = h - 1
+        for x in range(w):
+            v = gray[y, x]
+            new = 0 if v < 128 else 255
+            out[y, x] = (255 - new) >> 7
+            if x + 1 < w:
+                gray[y, x + 1] += (7 * (v - new)) >> 4
+        return out
+
+    @njit("uint8[:, ::1](int16[:, ::1], int64[::1])", cache=True, nogil=True, parallel=True)
+    def _fs_dither_bands(gray, bounds):
+        """Dither each row band gray[bounds[i]:bounds[i + 1]] on its own thread."""
+        out = np.empty(gray.shape, dtype=np.uint8)
+        for i in prange(bounds.size - 1):
+            out[bounds[i]:bounds[i + 1]] = _fs_dither(gray[bounds[i]:bounds[i + 1]])
+        return out
+
+
+def _band_bounds(gray):
+    """Split a strip into independent bands at the middle of each white gap.
+
+    Almost no error diffuses across a white spacer, so the photos either side
+    of one dither the same whether done together or apart.
+    """
+    white = np.flatnonzero(gray.min(axis=1) >= STRIP_WHITE_ROW)
+    if white.size == 0:
+        return np.array([0, gray.shape[0]], dtype=np.int64)
+    # Group consecutive white rows into runs, cut each run in half
+    breaks = np.flatnonzero(np.diff(white) > 1)
+    starts = white[np.r_[0, breaks + 1]]
+    ends = white[np.r_[breaks, white.size - 1]]
+    cuts = (starts + ends + 1) // 2
+    return np.unique(np.r_[0, cuts, gray.shape[0]]).astype(np.int64)
+
+
+def _dither_1bit(gray, is_strip=False):
+    """Dither a uint8 grayscale array to a bool "print dot" mask (THERMAL_DITHER).
+
+    Floyd-Steinberg strips are dithered one photo at a time in parallel when
+    Numba is available.
+    """
+    if THERMAL_DITHER == "bayer":
+        height, width = gray.shape
+        reps = (-(-height // 16), -(-width // 16))
+        return gray < np.tile(BAYER_THRESHOLDS, reps)[:height, :width]
+    if NUMBA_AVAILABLE:
+        err = gray.astype(np.int16)
+        # The kernels emit 0/1 bytes, which reinterpret as bool for free
+        if is_strip:
+            return _fs_dither_bands(err, _band_bounds(gray)).view(np.bool_)
+        return _fs_dither(err).view(np.bool_)
+    from PIL import Image
+    white = Image.fromarray(gray).convert('1', dither=Image.Dither.FLOYDSTEINBERG)
+    return ~np.asarray(white)
+
+
+def _pack_column_format(dots):
+    """Pack a bool dot mask into ESC/POS `ESC *` 24-dot column-format bytes.
+
+    Produces the same byte stream as python-escpos'
+    printer.image(..., impl="bitImageColumn"), without the PNG round trip
+    or its per-band PIL transforms.
+    """
+    height, width = dots.shape
+    bands = -(-height // 24)
+    padded = np.zeros((bands * 24, width), dtype=np.uint8)
+    padded[:height] = dots
+    # (band, row, col) -> (band, col, row): 24 vertical dots -> 3 bytes, MSB on top
+    columns = np.packbits(padded.reshape(bands, 24, width).transpose(0, 2, 1), axis=2)
+
+    header = ESC + b"*" + bytes((ESC_STAR_DENSITY,)) + width.to_bytes(2, "little")
+    out = [ESC + b"3" + bytes((16,))]  # line feed = 16 dots between bands
+    for band in columns:
+        out.append(header + band.tobytes() + b"\n")
+    out.append(ESC + b"2")  # reset line feed
+    return b"".join(out)
+
+
+def _center_square(frame):
+    """Return the largest centered square view of an ndarray image."""
+    height, width = frame.shape[:2]
+    min_dim = min(width, height)
+    left = (width - min_dim) // 2
+    top = (height - min_dim) // 2
+    return frame[top:top + min_dim, left:left + min_dim]
+
+
+def _read_gray(image_path, is_strip):
+    """Decode image_path to grayscale for process_for_thermal.
+
+    Uses the same gray as the in-memory frame_bgr path: the green channel
+    when FAST_GRAY is set, otherwise the JPEG decoder's luma plane directly
+    (no chroma upsampling or color conversion). When the source is at least
+    2x the print width it also scales down in the DCT domain, decoding a
+    fraction of the pixels.
+    """
+    if FAST_GRAY:
+        flag = cv2.IMREAD_COLOR
+        reduced_flags = ((8, cv2.IMREAD_REDUCED_COLOR_8),
+                         (4, cv2.IMREAD_REDUCED_COLOR_4),
+                         (2, cv2.IMREAD_REDUCED_COLOR_2))
+    else:
+        flag = cv2.IMREAD_GRAYSCALE
+        reduced_flags = ((8, cv2.IMREAD_REDUCED_GRAYSCALE_8),
+                         (4, cv2.IMREAD_REDUCED_GRAYSCALE_4),
+                         (2, cv2.IMREAD_REDUCED_GRAYSCALE_2))
+    try:
+        from PIL import Image
+        with Image.open(image_path) as img:  # reads the header only
+            width, height = img.size
+    except Exception:
+        pass
+    else:
+        printed = width if is_strip else min(width, height)  # side scaled to THERMAL_WIDTH
+        for factor, reduced in reduced_flags:
+            if printed // factor >= THERMAL_WIDTH:
+                flag = reduced
+                break
+    frame = cv2.imread(image_path, flag)
+    if frame is not None and FAST_GRAY:
+        frame = cv2.extractChannel(frame, 1)
+    return frame
+
+
+def process_for_thermal(image_path, is_strip=False, frame_bgr=None, save_preview=False):
+    """Process an image for optimal thermal printer output.
+
+    Returns the dithered image as ready-to-send ESC/POS bytes for
+    print_photo. Pass frame_bgr (e.g. PhotoboothCamera.last_frame) to skip
+    decoding image_path again. save_preview writes the dithered image to
+    <name>_thermal.png in the background without holding up the print.
+    """
+    if frame_bgr is not None:
+        frame = frame_bgr
+    else:
+        frame = _read_gray(image_path, is_strip)
+    if frame is None:
+        raise RuntimeError(f"Could not read image: {image_path}")
+
     if not is_strip:
-        width, height = img.size
-        min_dim = min(width, height)
-        left = (width - min_dim) / 2
-        top = (height - min_dim) / 2
-        right = (width + min_dim) / 2
-        bottom = (height + min_dim) / 2
-        img = img.crop((left, top, right, bottom))
-        img = img.resize((thermal_width, thermal_width), Image.Resampling.LANCZOS)
+        frame = _center_square(frame)
+        size = (THERMAL_WIDTH, THERMAL_WIDTH)
     else:
-        aspect = img.height / img.width
-        new_height = int(thermal_width * aspect)
-        img = img.resize((thermal_width, new_height), Image.Resampling.LANCZOS)
-    
-    img = img.convert('L')
-    img = img.filter(ImageFilter.SMOOTH)
-    enhancer = ImageEnhance.Contrast(img)
-    img = enhancer.enhance(1.2)
-    img = img.convert('1', dither=Image.Dither.FLOYDSTEINBERG)
-    
-    processed_path = image_path.replace('.jpg', '_thermal.png')
-    img.save(processed_path)
-    return processed_path
+        height, width = frame.shape[:2]
+        size = (THERMAL_WIDTH, int(THERMAL_WIDTH * height / width))
+
+    # Stay in NumPy/OpenCV until the final 1-bit conversion
+    if frame.ndim == 2:
+        gray = cv2.resize(frame, size, interpolation=cv2.INTER_AREA)
+    elif FAST_GRAY:
+        # Pull out green first so the resize only touches one channel
+        gray = cv2.resize(cv2.extractChannel(frame, 1), size, interpolation=cv2.INTER_AREA)
+    else:
+        small = cv2.resize(frame, size, interpolation=cv2.INTER_AREA)
+        gray = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+    # Smooth + contrast in one saturating convolution pass. Contrast matches
+    # ImageEnhance.Contrast (blend away from the image mean); smoothing keeps
+    # the mean, so it can be taken before filtering.
+    mean = cv2.mean(gray)[0]
+    gray = cv2.filter2D(gray, cv2.CV_8U, THERMAL_KERNEL,
+                        delta=(1 - THERMAL_CONTRAST) * mean,
+                        borderType=cv2.BORDER_REPLICATE)
+
+    dots = _dither_1bit(gray, is_strip)
+    if save_preview:
+        preview_path = os.path.splitext(image_path)[0] + "_thermal.png"
+        preview = np.where(dots, 0, 255).astype(np.uint8)  # black dots on white
+        threading.Thread(target=cv2.imwrite, args=(preview_path, preview, PNG_PARAMS),
+                         daemon=True).start()
+    return _pack_column_format(dots)
+
+
+@functools.lru_cache(maxsize=None)
+def _batched_usb_class():
+    """Import escpos and define BatchedUsb on first use."""
+    from escpos.printer import Usb
+
+    class BatchedUsb(Usb):
+        """Usb printer that queues every command and sends the whole job at once.
+
+        Each python-escpos call (set/text/cut/...) would otherwise be its own
+        tiny USB bulk transfer. Call flush() to write the queued bytes.
+        """
+
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            self._buf = bytearray()
+
+        def _raw(self, msg):
+            self._buf += msg
+
+        def flush(self):
+            data = bytes(self._buf)
+            self._buf.clear()
+            for start in range(0, len(data), USB_MAX_TRANSFER):
+                Usb._raw(self, data[start:start + USB_MAX_TRANSFER])
+
+    return BatchedUsb
+
+
+def __getattr__(name):
+    # Keep photobooth.BatchedUsb importable without eagerly loading escpos
+    if name == "BatchedUsb":
+        return _batched_usb_class()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+# The printer connection is opened once per process and reused across jobs
+# (USB find/claim costs tens to hundreds of ms). _printer_lock also keeps two
+# jobs from interleaving their bytes.
+_printer = None
+_printer_lock = threading.RLock()
+
+
+def open_printer():
+    """Return this process's printer connection (a BatchedUsb), connecting if needed."""
+    global _printer
+    with _printer_lock:
+        if _printer is None:
+            printer = _batched_usb_class()(VENDOR_ID, PRODUCT_ID, 0)
+            # python-escpos 3 otherwise defers the USB find/claim to the first write
+            printer.open()
+            _printer = printer
+        return _printer
+
+
+def _drop_printer():
+    """Close and forget the cached connection so the next job reconnects."""
+    global _printer
+    with _printer_lock:
+        if _printer is not None:
+            try:
+                _printer.close()
+            except Exception:
+                pass
+            _printer = None
+
+
+def open_printer_async():
+    """Start open_printer on a background thread and return its Future.
+
+    The first USB handshake doesn't depend on the photo, so start it before
+    process_for_thermal/create_photo_strip and pass the Future to print_photo.
+    """
+    pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="printer-open")
+    future = pool.submit(open_printer)
+    pool.shutdown(wait=False)
+    return future
+
+
+def _print_job(printer, thermal):
+    """Render one receipt (header, image, footer, cut) and flush it."""
+    printer.set(align='center', bold=True, double_height=True, double_width=True)
+    printer.text("THE OCHO\n")
+    printer.set(align='center', bold=False, double_height=False, double_width=False)
+    printer.text("PHOTOBOOTH\n")
+
+    printer.set(align='center', font='b')
+    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M")
+    printer.text(f"{timestamp}\n")
+    printer.set(font='a')
+    printer.text("\n")
+
+    print("🖨️ Printing image...")
+    if isinstance(thermal, (bytes, bytearray)):
+        printer._raw(thermal)
+    else:
+        printer.image(thermal, impl="bitImageColumn")
+
+    printer.text("\n")
+    printer.set(align='center')
+    printer.text("Thanks for visiting!\n")
+    printer.text("\n\n\n")
+    printer.cut()
+    printer.flush()
+
 
-def print_photo(image_path):
-    """Print a photo to the thermal printer."""
+def print_photo(thermal, printer=None):
+    """Print a photo to the thermal printer.
+
+    thermal is either the ESC/POS bytes returned by process_for_thermal or
+    a path to an image file. printer may be the Future from
+    open_printer_async(); by default the shared connection is used. If the
+    cached connection has gone stale (e.g. the printer was power-cycled),
+    the job reconnects and is retried once.
+    """
     print("🖨️ Connecting to printer...")
     try:
-        printer = Usb(VENDOR_ID, PRODUCT_ID, 0)
-        printer.set(align='center', bold=True, double_height=True, double_width=True)
-        printer.text("THE OCHO\n")
-        printer.set(align='center', bold=False, double_height=False, double_width=False)
-        printer.text("PHOTOBOOTH\n")
-        
-        printer.set(align='center', font='b')
-        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M")
-        printer.text(f"{timestamp}\n")
-        printer.set(font='a')
-        printer.text("\n")
-        
-        print("🖨️ Printing image...")
-        printer.image(image_path, impl="bitImageColumn")
-        
-        printer.text("\n")
-        printer.set(align='center')
-        printer.text("Thanks for visiting!\n")
-        printer.text("\n\n\n")
-        printer.cut()
-        printer.close()
+        import usb.core
+
+        # Resolve outside the lock: the opening thread needs it
+        if isinstance(printer, Future):
+            printer = printer.result()
+        with _printer_lock:
+            if printer is None:
+                printer = open_printer()
+            try:
+                _print_job(printer, thermal)
+            except usb.core.USBError as e:
+                print(f"⚠️ Printer connection lost ({e}), reconnecting...")
+                _drop_printer()
+                _print_job(open_printer(), thermal)
         print("✅ Print complete!")
         return True
     except Exception as e:
+        _drop_printer()
         print(f"❌ Print error: {e}")
         return False
 
-def create_photo_strip(photo_paths, spacing=20):
-    """Combine multiple photos into a vertical strip."""
+
+def _load_photo(photo):
+    """Return a BGR ndarray for a file path or an in-memory BGR ndarray."""
+    if not isinstance(photo, str):
+        return photo
+    frame = cv2.imread(photo)
+    if frame is None:
+        raise RuntimeError(f"Could not read image: {photo}")
+    return frame
+
+
+def create_photo_strip(photo_paths, spacing=20, target_width=THERMAL_WIDTH):
+    """Combine multiple photos into a vertical strip.
+
+    Entries may be file paths or BGR ndarrays (e.g. PhotoboothCamera.last_frame)
+    to skip decoding photos that are still in memory.
+    """
     if not photo_paths: return None
     
-    images = [Image.open(p) for p in photo_paths]
-    target_width = 576
-    resized = []
-    
-    for img in images:
-        width, height = img.size
-        min_dim = min(width, height)
-        left = (width - min_dim) / 2
-        top = (height - min_dim) / 2
-        right = (width + min_dim) / 2
-        bottom = (height + min_dim) / 2
-        img = img.crop((left, top, right, bottom))
-        resized.append(img.resize((target_width, target_width), Image.Resampling.LANCZOS))
-    
-    total_height = sum(img.height for img in resized) + spacing * (len(resized) - 1)
-    strip = Image.new('RGB', (target_width, total_height), 'white')
+    # Each photo is center-cropped square and resized straight into its slot
+    # of one preallocated white strip.
+    count = len(photo_paths)
+    strip = np.full((count * target_width + spacing * (count - 1), target_width, 3),
+                    255, dtype=np.uint8)
     
-    y_offset = 0
-    for img in resized:
-        strip.paste(img, (0, y_offset))
-        y_offset += img.height + spacing
+    def place(i, photo):
+        y_offset = i * (target_width + spacing)
+        cv2.resize(_center_square(_load_photo(photo)), (target_width, target_width),
+                   dst=strip[y_offset:y_offset + target_width],
+                   interpolation=cv2.INTER_AREA)
+
+    # Decode/resize release the GIL and each photo owns its own slot, so the
+    # photos can be placed concurrently
+    with ThreadPoolExecutor(max_workers=min(4, count)) as pool:
+        for future in [pool.submit(place, i, photo) for i, photo in enumerate(photo_paths)]:
+            future.result()
     
     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
     strip_path = os.path.join(PHOTOS_DIR, f"photostrip_{timestamp}.jpg")
-    strip.save(strip_path, quality=95)
+    cv2.imwrite(strip_path, strip, JPEG_PARAMS)
     return strip_path
 
 # --- Main CLI entry (Legacy/Standalone support) ---
 
+
 def run_standalone():
     import argparse
     parser = argparse.ArgumentParser()
@@ -360,22 +912,30 @@ def run_standalone():
     parser.add_argument("--headless", action="store_true")
     args = parser.parse_args()
     
-    cam = PhotoboothCamera(headless=args.headless)
+    if args.headless:
+        width, height = HEADLESS_CAPTURE_SIZE
+        cam = PhotoboothCamera(width=width, height=height, headless=True,
+                               passthrough_mjpeg=True)
+    else:
+        cam = PhotoboothCamera(headless=False)
     
     try:
         if args.strip:
-            paths = cam.capture_strip(countdown=args.countdown)
-            strip_path = create_photo_strip(paths)
+            cam.capture_strip(countdown=args.countdown)
+            printer = open_printer_async()
+            strip_path = create_photo_strip(cam.last_strip_frames)
             if strip_path:
                 thermal = process_for_thermal(strip_path, True)
-                print_photo(thermal)
+                print_photo(thermal, printer=printer)
         else:
             path = cam.capture(countdown=args.countdown)
             if path:
-                thermal = process_for_thermal(path)
-                print_photo(thermal)
+                printer = open_printer_async()
+                thermal = process_for_thermal(path, frame_bgr=cam.last_frame)
+                print_photo(thermal, printer=printer)
     finally:
         cam.close()
 
+
 if __name__ == "__main__":
     run_standalone()
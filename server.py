@@ -8,11 +8,14 @@ import sys
 import time
 import threading
 import json
-from flask import Flask, render_template, jsonify, send_from_directory
+import atexit
+import signal
+from concurrent.futures import ThreadPoolExecutor
+from operator import itemgetter
+from flask import Flask, render_template, jsonify, request, send_from_directory
 from flask_cors import CORS
-from photobooth import PhotoboothCamera, process_for_thermal, print_photo, create_photo_strip
-import glob
-from PIL import Image
+from photobooth import (PhotoboothCamera, process_for_thermal, print_photo, create_photo_strip,
+                        open_printer_async, HEADLESS_CAPTURE_SIZE)
 
 # Set library path for libusb on macOS
 if sys.platform == "darwin":
@@ -23,11 +26,38 @@ if sys.platform == "darwin":
 # Get paths
 SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
 PHOTOS_DIR = os.path.join(SCRIPT_DIR, "photos")
+PHOTOS_PREFIX = PHOTOS_DIR + os.sep  # + a basename()'d filename: no join needed
 FRONTEND_DIR = os.path.join(SCRIPT_DIR, "frontend", "dist")
 
 
 app = Flask(__name__, static_folder=FRONTEND_DIR, static_url_path='')
 CORS(app)
+# Behind a proxy that honours X-Sendfile (Apache mod_xsendfile, lighttpd),
+# set PHOTOBOOTH_XSENDFILE=1 so photo bytes bypass Python entirely
+app.config['USE_X_SENDFILE'] = os.environ.get('PHOTOBOOTH_XSENDFILE') == '1'
+
+# Optional: orjson serializes the hot polling responses several times faster
+try:
+    import orjson
+    _json_dumps = orjson.dumps
+except ImportError:
+    def _json_dumps(payload):
+        return json.dumps(payload, separators=(',', ':')).encode()
+
+
+def _json_response(payload):
+    return app.response_class(_json_dumps(payload), mimetype='application/json')
+
+
+# Optional: gzip JSON API responses (the /api/photos list grows with the
+# gallery). Photos are JPEG already, so only JSON is compressed.
+try:
+    from flask_compress import Compress
+    app.config['COMPRESS_MIMETYPES'] = ['application/json']
+    app.config['COMPRESS_LEVEL'] = 5
+    Compress(app)
+except ImportError:
+    pass
 
 # Global Camera Instance
 camera = None
@@ -35,18 +65,79 @@ camera = None
 # Track if a photo is currently being taken
 photo_in_progress = False
 last_result = {"status": "ready", "message": "Ready to take photos!"}
+# Set by /api/cancel; countdowns wait on it instead of sleeping
+cancel_requested = threading.Event()
+
+# /api/status?since=<version> long-polls: it answers as soon as the version
+# moves on (or after STATUS_LONG_POLL_TIMEOUT), instead of every client poll
+# returning the same payload
+STATUS_LONG_POLL_TIMEOUT = 25.0
+# waitress worker threads. Every open page parks one thread in /api/status
+# for up to STATUS_LONG_POLL_TIMEOUT, so size the pool for the expected
+# pollers plus threads kept free for captures, photos and the gallery.
+EXPECTED_STATUS_POLLERS = 8  # phones/tabs watching the booth at once
+REQUEST_WORKERS = 8          # concurrent non-poll requests
+SERVER_THREADS = EXPECTED_STATUS_POLLERS + REQUEST_WORKERS
+result_version = 0
+_result_cv = threading.Condition()
+
+
+def _bump_result_version():
+    """Wake long-polling /api/status requests after a status change."""
+    global result_version
+    with _result_cv:
+        result_version += 1
+        _result_cv.notify_all()
+
+
+def _set_result(result):
+    global last_result
+    last_result = result
+    _bump_result_version()
+
+
+class CaptureCancelled(Exception):
+    pass
+
+
+def _countdown(seconds):
+    """Wait out a countdown, raising CaptureCancelled if /api/cancel is hit."""
+    if cancel_requested.wait(seconds):
+        raise CaptureCancelled()
+
+
+# Print jobs run one at a time off the capture thread, so the next photo can
+# start while the previous one is still printing
+print_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="printq")
+# Captures run on one persistent worker instead of a thread per request
+capture_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="capture")
+_capture_lock = threading.Lock()  # makes the photo_in_progress check-and-set atomic
+
+
+def _process_and_print(filepath, is_strip=False, frame_bgr=None):
+    """Thermal-process and print a photo. Runs on print_executor."""
+    try:
+        printer = open_printer_async()
+        thermal = process_for_thermal(filepath, is_strip=is_strip, frame_bgr=frame_bgr)
+        print_photo(thermal, printer=printer)
+    except Exception as e:
+        print(f"Error printing {os.path.basename(filepath)}: {e}")
 
 
 def init_camera():
     global camera
     if camera is None:
         try:
-            # Headless = True because this is a web server
-            camera = PhotoboothCamera(headless=True)
+            # Headless = True because this is a web server; with no live
+            # preview, capture at the smaller print-friendly size
+            width, height = HEADLESS_CAPTURE_SIZE
+            camera = PhotoboothCamera(width=width, height=height, headless=True,
+                                      passthrough_mjpeg=True)
             print("✅ Global camera initialized successfully!")
         except Exception as e:
             print(f"❌ Failed to initialize camera: {e}")
 
+
 # Initialize camera on startup
 init_camera()
 
@@ -56,10 +147,14 @@ joystick = None
 
 # Metadata file path
 METADATA_FILE = os.path.join(PHOTOS_DIR, "metadata.json")
+# Copy-on-write: writers rebuild these under _metadata_lock and rebind them,
+# so readers (gallery listing, metadata flush) use them lock-free
 photo_metadata = {}
+liked_photos = frozenset()  # filenames whose metadata has liked=True, for get_sorted_photos
+
 
 def load_metadata():
-    global photo_metadata
+    global photo_metadata, liked_photos
     if os.path.exists(METADATA_FILE):
         try:
             with open(METADATA_FILE, 'r') as f:
@@ -67,42 +162,115 @@ def load_metadata():
         except Exception as e:
             print(f"Error loading metadata: {e}")
             photo_metadata = {}
+    liked_photos = frozenset(name for name, meta in photo_metadata.items() if meta.get("liked"))
+
+
+# Likes/deletes only mark metadata dirty; a background flusher writes it
+# out at most this often (and once more at exit)
+METADATA_FLUSH_INTERVAL = 5.0
+_metadata_lock = threading.Lock()  # serializes metadata writers, the dirty flag and flushes
+_metadata_dirty = False
+
 
 def save_metadata():
+    """Write metadata.json atomically (temp file + os.replace).
+
+    Callers hold _metadata_lock, so two flushes can't share the .tmp file
+    or replace a newer snapshot with an older one.
+    """
+    data = json.dumps(photo_metadata)
+    tmp_file = METADATA_FILE + ".tmp"
     try:
-        with open(METADATA_FILE, 'w') as f:
-            json.dump(photo_metadata, f)
+        with open(tmp_file, 'w') as f:
+            f.write(data)
+        os.replace(tmp_file, METADATA_FILE)
     except Exception as e:
         print(f"Error saving metadata: {e}")
 
+
+def _mark_metadata_dirty():
+    """Flag metadata for the next flush. Call with _metadata_lock held."""
+    global _metadata_dirty
+    _metadata_dirty = True
+
+
+def _flush_metadata():
+    """Save metadata if anything changed since the last flush."""
+    global _metadata_dirty
+    with _metadata_lock:
+        if not _metadata_dirty:
+            return
+        _metadata_dirty = False
+        save_metadata()
+
+
+def _metadata_flusher():
+    while True:
+        time.sleep(METADATA_FLUSH_INTERVAL)
+        _flush_metadata()
+
+
+threading.Thread(target=_metadata_flusher, daemon=True, name="metadata").start()
+atexit.register(_flush_metadata)
+
+
+def _on_sigterm(signum, frame):
+    # systemd stops the service with SIGTERM, which skips atexit handlers
+    _flush_metadata()
+    sys.exit(0)
+
+
+if threading.current_thread() is threading.main_thread():
+    signal.signal(signal.SIGTERM, _on_sigterm)
+
 # Load metadata on startup
 load_metadata()
 
+# Serialized /api/photos body, keyed on the photos dir mtime plus a version
+# bumped on every metadata change or capture (in-place writes such as
+# metadata.json don't touch the dir mtime)
+_metadata_version = 0
+_photos_cache = (None, None)  # (key, body); one tuple so swaps are atomic
+
+
+def _invalidate_photos():
+    global _metadata_version
+    _metadata_version += 1
+
 
+# Gallery scan filter. Strip source shots are internal; only show final
+# outputs in gallery. Dotfiles (e.g. macOS "._" resource forks) were skipped
+# by glob too.
+GALLERY_SUFFIX = ".jpg"
+GALLERY_EXCLUDE = (".", "strip_")
+
+
+def _photo_entry(entry):
+    """Gallery dict for a scandir entry, or None if it vanished mid-scan."""
+    try:
+        timestamp = entry.stat().st_mtime
+    except FileNotFoundError:
+        return None
+    filename = entry.name
+    return {
+        "filename": filename,
+        "timestamp": timestamp,
+        "liked": filename in liked_photos
+    }
 
 
 def get_sorted_photos():
     """Get all photos sorted by newest first with metadata"""
-    # pattern match both jpg and png
-    files = glob.glob(os.path.join(PHOTOS_DIR, "*.jpg"))
-    
-    photo_list = []
-    for f in files:
-        filename = os.path.basename(f)
-        if filename.startswith("strip_"):
-            # Strip source shots are internal; only show final outputs in gallery.
-            continue
-        timestamp = os.path.getmtime(f)
-        is_liked = photo_metadata.get(filename, {}).get("liked", False)
-        
-        photo_list.append({
-            "filename": filename,
-            "timestamp": timestamp,
-            "liked": is_liked
-        })
+    # One directory read; names are filtered before any stat call
+    with os.scandir(PHOTOS_DIR) as entries:
+        photo_list = [_photo_entry(entry) for entry in entries
+                      if entry.name.endswith(GALLERY_SUFFIX)
+                      and not entry.name.startswith(GALLERY_EXCLUDE)]
+    if None in photo_list:
+        photo_list = [photo for photo in photo_list if photo is not None]
 
     # Sort by modification time, newest first (default)
-    photo_list.sort(key=lambda x: x["timestamp"], reverse=True)
+    photo_list.sort(key=itemgetter("timestamp"), reverse=True)
     return photo_list
 
 
@@ -120,8 +288,13 @@ def gallery():
 
 @app.route('/api/status')
 def status():
-    """Get current status"""
-    return jsonify({
+    """Get current status; with ?since=<version>, wait for a newer one"""
+    since = request.args.get('since', type=int)
+    if since is not None:
+        with _result_cv:
+            _result_cv.wait_for(lambda: result_version != since, STATUS_LONG_POLL_TIMEOUT)
+    return _json_response({
+        "version": result_version,
         "in_progress": photo_in_progress,
         "joystick_connected": joystick.connected if joystick else False,
         **last_result
@@ -131,27 +304,35 @@ def status():
 @app.route('/api/photos')
 def list_photos():
     """Get list of all photos with metadata"""
-    photos = get_sorted_photos()
-    return jsonify({"photos": photos})
+    global _photos_cache
+    key = (os.stat(PHOTOS_DIR).st_mtime_ns, _metadata_version)
+    cached_key, body = _photos_cache
+    if key != cached_key:
+        photos = get_sorted_photos()
+        body = _json_dumps({"photos": photos})
+        _photos_cache = (key, body)
+    return app.response_class(body, mimetype='application/json')
 
 
 @app.route('/api/like/<path:filename>', methods=['POST'])
 def toggle_like(filename):
     """Toggle the liked status of a photo"""
+    global photo_metadata, liked_photos
     filename = os.path.basename(filename)
     
-    if filename not in photo_metadata:
-        photo_metadata[filename] = {}
-        
-    current_status = photo_metadata[filename].get("liked", False)
-    photo_metadata[filename]["liked"] = not current_status
+    with _metadata_lock:
+        entry = dict(photo_metadata.get(filename, {}))
+        liked = entry["liked"] = not entry.get("liked", False)
+        photo_metadata = {**photo_metadata, filename: entry}
+        liked_photos = liked_photos | {filename} if liked else liked_photos - {filename}
+        _mark_metadata_dirty()
     
-    save_metadata()
+    _invalidate_photos()
     
     return jsonify({
         "status": "success", 
         "filename": filename, 
-        "liked": photo_metadata[filename]["liked"]
+        "liked": liked
     })
 
 
@@ -161,24 +342,18 @@ def reprint_photo(filename):
     try:
         # Sanitize filename (basic check)
         filename = os.path.basename(filename)
-        filepath = os.path.join(PHOTOS_DIR, filename)
+        filepath = PHOTOS_PREFIX + filename
         
         if not os.path.exists(filepath):
             return jsonify({"status": "error", "message": "File not found"}), 404
             
-        def do_print():
-            # Check for existing thermal version or process unique 
-            # (Photobooth.process_for_thermal handles creating the file)
-            # Determine if it's a strip based on filename or just try generic?
-            # Our primary filenames: "photo_..." or "photostrip_..."
-            # Strip source captures are stored as "strip_..." and should be treated as non-strip.
-            is_strip = "photostrip" in filename
-            thermal_path = process_for_thermal(filepath, is_strip=is_strip)
-            print_photo(thermal_path)
-            
-        # Run in background to not block
-        thread = threading.Thread(target=do_print)
-        thread.start()
+        # The filename prefix is the canonical classification:
+        # "photo_..." or "photostrip_..." (see create_photo_strip).
+        # Strip source captures are stored as "strip_..." and should be treated as non-strip.
+        is_strip = filename.startswith("photostrip_")
+
+        # Queue behind any print in progress; don't block the request
+        print_executor.submit(_process_and_print, filepath, is_strip)
         
         return jsonify({"status": "success", "message": "Reprinting..."})
         
@@ -190,25 +365,31 @@ def reprint_photo(filename):
 @app.route('/api/delete/<path:filename>', methods=['POST'])
 def delete_photo(filename):
     """Delete a photo and its associated data"""
+    global photo_metadata, liked_photos
     try:
         filename = os.path.basename(filename)
-        filepath = os.path.join(PHOTOS_DIR, filename)
+        filepath = PHOTOS_PREFIX + filename
         
-        if not os.path.exists(filepath):
+        # Delete original file (one syscall; no exists() check to race)
+        try:
+            os.remove(filepath)
+        except FileNotFoundError:
             return jsonify({"status": "error", "message": "File not found"}), 404
-            
-        # Delete original file
-        os.remove(filepath)
         
         # Delete thermal version if exists
         thermal_path = filepath.replace('.jpg', '_thermal.png')
-        if os.path.exists(thermal_path):
+        try:
             os.remove(thermal_path)
+        except FileNotFoundError:
+            pass
             
         # Remove from metadata
-        if filename in photo_metadata:
-            del photo_metadata[filename]
-            save_metadata()
+        with _metadata_lock:
+            if filename in photo_metadata:
+                photo_metadata = {k: v for k, v in photo_metadata.items() if k != filename}
+                liked_photos = liked_photos - {filename}
+                _mark_metadata_dirty()
+        _invalidate_photos()
             
         return jsonify({"status": "success", "message": "Photo deleted"})
         
@@ -219,106 +400,120 @@ def delete_photo(filename):
 
 def _do_single_capture():
     """Capture a single photo, process, and print. Runs in a background thread."""
-    global photo_in_progress, last_result
+    global photo_in_progress
 
     try:
         target_time = time.time() + 3
-        last_result = {
+        _set_result({
             "status": "countdown",
             "target_timestamp": target_time,
             "message": "Say cheese! 📸"
-        }
-        time.sleep(3)
+        })
+        _countdown(3)
 
-        last_result = {"status": "capturing", "message": "SNAP!"}
+        _set_result({"status": "capturing", "message": "SNAP!"})
         filepath = camera.capture(countdown=0)
 
         if filepath:
             filename = os.path.basename(filepath)
-            last_result = {
+            _set_result({
                 "status": "success",
                 "message": "Photo captured! Printing...",
                 "photo_url": f"/photos/{filename}"
-            }
-            thermal_path = process_for_thermal(filepath)
-            print_photo(thermal_path)
+            })
+            # Print from the in-memory frame; the next photo can start meanwhile
+            print_executor.submit(_process_and_print, filepath, frame_bgr=camera.last_frame)
         else:
-            last_result = {"status": "error", "message": "Capture returned empty"}
+            _set_result({"status": "error", "message": "Capture returned empty"})
+    except CaptureCancelled:
+        _set_result({"status": "ready", "message": "Cancelled"})
     except Exception as e:
         print(f"Error taking photo: {e}")
-        last_result = {"status": "error", "message": str(e)[:100]}
+        _set_result({"status": "error", "message": str(e)[:100]})
     finally:
+        _invalidate_photos()  # a file's final write doesn't bump the dir mtime
         photo_in_progress = False
+        _bump_result_version()
 
 
 def _do_strip_capture():
     """Capture a photo strip (3 photos), stitch, and print. Runs in a background thread."""
-    global photo_in_progress, last_result
+    global photo_in_progress
 
     try:
         photo_paths = []
+        strip_frames = []  # decoded captures, so stitching skips the JPEG decode
         num_photos = 3
 
         for i in range(num_photos):
             target_time = time.time() + 3
-            last_result = {
+            _set_result({
                 "status": "countdown",
                 "target_timestamp": target_time,
                 "photo_index": i + 1,
                 "total_photos": num_photos,
                 "message": f"Pose {i+1}/{num_photos}"
-            }
-            time.sleep(3)
+            })
+            _countdown(3)
 
-            last_result = {"status": "capturing", "message": "SNAP!"}
-            path = camera.capture(countdown=0, filename_prefix="strip")
+            _set_result({"status": "capturing", "message": "SNAP!"})
+            path = camera.capture(countdown=0, filename_prefix="strip", background_save=True)
             if path:
                 photo_paths.append(path)
+                strip_frames.append(camera.last_frame)
 
             if i < num_photos - 1:
                 target_time = time.time() + 2
-                last_result = {
+                _set_result({
                     "status": "waiting",
                     "target_timestamp": target_time,
                     "message": "Next pose..."
-                }
-                time.sleep(2)
+                })
+                _countdown(2)
 
         if photo_paths:
-            last_result = {"status": "processing", "message": "Stitching strip..."}
-            strip_path = create_photo_strip(photo_paths)
+            _set_result({"status": "processing", "message": "Stitching strip..."})
+            strip_path = create_photo_strip(strip_frames)
+            strip_frames.clear()  # drop the full-res shots before printing
+            camera.wait_for_saves()
 
             if strip_path:
                 filename = os.path.basename(strip_path)
-                last_result = {
+                _set_result({
                     "status": "success",
                     "message": "Strip captured! Printing...",
                     "photo_url": f"/photos/{filename}"
-                }
-                thermal_path = process_for_thermal(strip_path, is_strip=True)
-                print_photo(thermal_path)
+                })
+                print_executor.submit(_process_and_print, strip_path, is_strip=True)
             else:
-                last_result = {"status": "error", "message": "Failed to stitch strip"}
+                _set_result({"status": "error", "message": "Failed to stitch strip"})
         else:
-            last_result = {"status": "error", "message": "Failed to capture strip photos"}
+            _set_result({"status": "error", "message": "Failed to capture strip photos"})
 
+    except CaptureCancelled:
+        _set_result({"status": "ready", "message": "Cancelled"})
     except Exception as e:
         print(f"Error taking strip: {e}")
-        last_result = {"status": "error", "message": str(e)[:100]}
+        _set_result({"status": "error", "message": str(e)[:100]})
     finally:
+        _invalidate_photos()  # a file's final write doesn't bump the dir mtime
         photo_in_progress = False
+        _bump_result_version()
 
 
 def _start_capture(capture_fn):
     """Guard + launch a capture function in a background thread.
     Returns (ok, error_message). Sets photo_in_progress before spawning."""
     global photo_in_progress
-    if photo_in_progress:
-        return False, "Photo already in progress!"
-    if not camera:
-        return False, "Camera not initialized!"
-    photo_in_progress = True
-    threading.Thread(target=capture_fn).start()
+    with _capture_lock:
+        if photo_in_progress:
+            return False, "Photo already in progress!"
+        if not camera:
+            return False, "Camera not initialized!"
+        photo_in_progress = True
+    _bump_result_version()
+    cancel_requested.clear()
+    capture_executor.submit(capture_fn)
     return True, None
 
 
@@ -342,17 +537,26 @@ def take_strip():
     return jsonify({"status": "started", "message": "Taking photo strip..."})
 
 
+@app.route('/api/cancel', methods=['POST'])
+def cancel_capture():
+    """Cancel a photo or strip that is still counting down"""
+    if not photo_in_progress:
+        return jsonify({"status": "error", "message": "Nothing to cancel"}), 400
+    cancel_requested.set()
+    return jsonify({"status": "cancelling", "message": "Cancelling..."})
+
+
 @app.route('/photos/<path:filename>')
 def serve_photo(filename):
     """Serve photos from the photos directory"""
-    response = send_from_directory(PHOTOS_DIR, filename)
-    response.headers['Cache-Control'] = 'public, max-age=31536000'
+    # conditional: answer If-None-Match / If-Modified-Since (mtime+size ETag)
+    # with 304, so gallery re-renders don't resend the JPEGs
+    response = send_from_directory(PHOTOS_DIR, filename, conditional=True, etag=True,
+                                   max_age=31536000)
+    response.cache_control.public = True
     return response
 
 
-
-
-
 # Initialize joystick controller (optional — server works fine without it)
 def init_joystick():
     global joystick
@@ -366,6 +570,7 @@ def init_joystick():
     except Exception as e:
         print(f"🕹️  Joystick not available: {e}")
 
+
 init_joystick()
 
 
@@ -388,5 +593,17 @@ if __name__ == '__main__':
     print("\n   Open the Network URL on your phone!")
     print("=" * 50 + "\n")
     
-    # We don't want to reloader to restart and kill the camera constantly
-    app.run(host='0.0.0.0', port=8080, debug=False, use_reloader=False)
+    # Serve from this one process so the camera singleton stays valid: a
+    # pre-fork server (gunicorn) would fork away the camera's capture thread.
+    # waitress is a production threaded WSGI server; fall back to Werkzeug's
+    # dev server if it isn't installed.
+    try:
+        from waitress import serve
+    except ImportError:
+        serve = None
+
+    if serve:
+        serve(app, host='0.0.0.0', port=8080, threads=SERVER_THREADS)
+    else:
+        # We don't want to reloader to restart and kill the camera constantly
+        app.run(host='0.0.0.0', port=8080, debug=False, use_reloader=False, threaded=True)
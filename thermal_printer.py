@@ -10,8 +10,15 @@ If USB detection fails, you may need to:
     export DYLD_LIBRARY_PATH=/opt/homebrew/lib:$DYLD_LIBRARY_PATH
 """
 
+import argparse
+import array
+import atexit
+import functools
+import json
 import os
+import struct
 import sys
+from concurrent.futures import ThreadPoolExecutor
 
 # Set library path for libusb on macOS (Homebrew)
 if sys.platform == "darwin":
@@ -19,22 +26,237 @@ if sys.platform == "darwin":
     if os.path.exists(homebrew_lib):
         os.environ["DYLD_LIBRARY_PATH"] = homebrew_lib + ":" + os.environ.get("DYLD_LIBRARY_PATH", "")
 
-from escpos.printer import Usb, Serial
+import numpy as np
+from escpos.printer import Dummy, Usb, Serial
+from PIL import Image, ImageOps
 import usb.core
 import usb.util
 
+# IDs of the last printer find_printer() detected, so a cold start can skip
+# the bus scan. Kept with the app data (next to photos/metadata.json);
+# override with PHOTOBOOTH_PRINTER_CACHE, or set it empty to disable.
+PRINTER_CACHE_FILE = os.environ.get(
+    "PHOTOBOOTH_PRINTER_CACHE",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "photos", "printer.json"))
+
+# Open Usb handles keyed by (vendor_id, product_id). Opening one enumerates
+# the bus and claims the interface, so it is done once and reused.
+_PRINTER_CACHE = {}
+
+# Bulk writes are split into chunks of about this many bytes (rounded down to
+# whole packets), each of which must drain within USB_WRITE_TIMEOUT_MS. The
+# printer NAKs while its buffer is full, so one huge write would otherwise
+# need an unbounded timeout. Override with --chunk-size.
+WRITE_CHUNK_SIZE = 4096
+USB_WRITE_TIMEOUT_MS = 5000
+
+
+class ChunkedUsb(Usb):
+    """Usb printer that writes in packet-aligned chunks with a finite timeout."""
+
+    chunk_size = WRITE_CHUNK_SIZE
+    _tx = None
+
+    def _raw(self, msg):
+        """Send msg through one reused array('B') transfer buffer.
+
+        pyusb hands an array('B') straight to libusb but copies anything
+        else, so full chunks are copied once into the buffer instead of
+        being sliced and converted per write.
+        """
+        chunk = self.chunk_size
+        if self._tx is None or len(self._tx) != chunk:
+            self._tx = array.array("B", bytes(chunk))
+        tx = memoryview(self._tx)
+        data = memoryview(msg).cast("B")
+        for start in range(0, len(data), chunk):
+            part = data[start:start + chunk]
+            if len(part) == chunk:
+                tx[:] = part
+                self.device.write(self.out_ep, self._tx, self.timeout)
+            else:
+                tail = array.array("B")
+                tail.frombytes(part)
+                self.device.write(self.out_ep, tail, self.timeout)
+
+
+def _get_printer(vendor_id, product_id):
+    """Return an open Usb handle for the printer, connecting on first use."""
+    key = (vendor_id, product_id)
+    printer = _PRINTER_CACHE.get(key)
+    if printer is None:
+        printer = ChunkedUsb(vendor_id, product_id, timeout=USB_WRITE_TIMEOUT_MS)
+        printer.open()
+        endpoint = _bulk_out_endpoint(printer.device)
+        packet = 64  # full-speed bulk wMaxPacketSize
+        if endpoint is not None:
+            printer.out_ep = endpoint.bEndpointAddress
+            packet = endpoint.wMaxPacketSize or packet
+        printer.chunk_size = max(1, WRITE_CHUNK_SIZE // packet) * packet
+        _PRINTER_CACHE[key] = printer
+    return printer
+
+
+def _bulk_out_endpoint(device):
+    """The first bulk OUT endpoint of interface 0, or None if there isn't one.
+
+    python-escpos assumes endpoint 0x01; read the real address once from the
+    descriptor instead.
+    """
+    try:
+        interface = device.get_active_configuration()[(0, 0)]
+    except (usb.core.USBError, KeyError, IndexError):
+        return None
+    return usb.util.find_descriptor(
+        interface,
+        custom_match=lambda ep: (
+            usb.util.endpoint_direction(ep.bEndpointAddress) == usb.util.ENDPOINT_OUT
+            and usb.util.endpoint_type(ep.bmAttributes) == usb.util.ENDPOINT_TYPE_BULK))
+
+
+def _drop_printer(vendor_id, product_id):
+    """Forget a handle after an error so the next print reconnects."""
+    printer = _PRINTER_CACHE.pop((vendor_id, product_id), None)
+    if printer is not None:
+        try:
+            printer.close()
+        except Exception:
+            pass
+
+
+@atexit.register
+def _close_printers():
+    for key in list(_PRINTER_CACHE):
+        _drop_printer(*key)
+
+
+def load_cached_printer():
+    """Return the (vendor_id, product_id) saved by find_printer(), or None."""
+    if not PRINTER_CACHE_FILE:
+        return None
+    try:
+        with open(PRINTER_CACHE_FILE) as f:
+            ids = json.load(f)
+        return int(ids["vendor_id"]), int(ids["product_id"])
+    except (OSError, ValueError, KeyError, TypeError):
+        return None
+
+
+def _save_cached_printer(vendor_id, product_id):
+    """Best effort: a missing photos dir or read-only disk just skips it."""
+    if not PRINTER_CACHE_FILE:
+        return
+    try:
+        with open(PRINTER_CACHE_FILE, "w") as f:
+            json.dump({"vendor_id": vendor_id, "product_id": product_id}, f)
+    except OSError:
+        pass
+
+
+GS = b"\x1d"
+RASTER_FRAGMENT_ROWS = 960  # rows per GS v 0 command (python-escpos' default)
+
+# Common thermal printer vendor IDs
+THERMAL_VENDORS = {
+    0x0416: "RONGTA",
+    0x0483: "STMicroelectronics (common for thermal printers)",
+    0x04B8: "Epson",
+    0x0525: "Generic Thermal Printer",
+    0x1504: "RONGTA",
+    0x0FE6: "Generic Printer",
+    0x1FC9: "NXP (common for thermal printers)",
+    0x28E9: "RONGTA",
+    0x1A86: "QinHeng (common for thermal printers)",
+}
+THERMAL_VIDS = frozenset(THERMAL_VENDORS)
+
+# USB string descriptors keyed by (idVendor, idProduct, string index). Each
+# read is a synchronous control transfer, so repeated scans reuse them.
+_STRING_CACHE = {}
+
+
+LANGID_EN_US = 0x0409
+
+
+def _read_string(device, index):
+    """Read a USB string descriptor with a single GET_DESCRIPTOR transfer.
+
+    usb.util.get_string() first fetches the device's LANGID table (a second
+    control transfer); nearly every device offers en-US, so ask for it
+    directly and fall back to pyusb if the device refuses.
+    """
+    if not index:  # index 0 is the LANGID table, not a string
+        return None
+    try:
+        desc = device.ctrl_transfer(0x80, 0x06, 0x0300 | index, LANGID_EN_US, 255)
+    except usb.core.USBError:
+        return usb.util.get_string(device, index)
+    if len(desc) < 2 or desc[1] != 0x03:  # not a string descriptor
+        return usb.util.get_string(device, index)
+    return bytes(desc[2:desc[0]]).decode("utf-16-le", errors="replace")
+
+
+# What reading a string descriptor can raise (I/O errors, no LANGID table,
+# backend without control transfers)
+STRING_ERRORS = (usb.core.USBError, ValueError, NotImplementedError)
+
+
+def _cached_get_string(device, index):
+    """String descriptor through _STRING_CACHE. Raises one of STRING_ERRORS.
+
+    Index 0 means the device has no such string: None, with no transfer.
+    """
+    if not index:
+        return None
+    key = (device.idVendor, device.idProduct, index)
+    try:
+        return _STRING_CACHE[key]
+    except KeyError:
+        string = _STRING_CACHE[key] = _read_string(device, index)
+        return string
+
+
+# Linux usbfs: udev adds/removes a node under /dev/bus/usb/<bus>/ for every
+# device plugged in or out, which bumps that directory's mtime
+USB_DEVFS = "/dev/bus/usb"
+
+# (bus signature, printers) from the last find_printer() scan
+_scan_cache = (None, None)
+
+
+def _bus_signature():
+    """Token that changes whenever a USB device is attached or removed.
+
+    Costs a few stat calls instead of a bus enumeration. None where usbfs
+    isn't available (macOS, Windows), in which case every call rescans.
+    """
+    try:
+        with os.scandir(USB_DEVFS) as buses:
+            return (os.stat(USB_DEVFS).st_mtime_ns,
+                    tuple(sorted((bus.name, bus.stat().st_mtime_ns) for bus in buses)))
+    except OSError:
+        return None
+
 
 def find_printer():
     """
     Find connected USB printers and display their info.
     Returns a list of tuples (vendor_id, product_id, description)
+
+    The result is reused until a USB device is plugged in or out.
     """
+    global _scan_cache
+    signature = _bus_signature()
+    if signature is not None and signature == _scan_cache[0]:
+        print("🔍 USB devices unchanged, reusing the last scan\n")
+        return list(_scan_cache[1])
+
     printers = []
     
     print("🔍 Scanning for USB devices...\n")
     
     try:
-        devices = usb.core.find(find_all=True)
+        devices = list(usb.core.find(find_all=True))
     except usb.core.NoBackendError:
         print("❌ No USB backend available.")
         print("   On macOS, try: brew install libusb")
@@ -42,37 +264,36 @@ def find_printer():
         print("   export DYLD_LIBRARY_PATH=/opt/homebrew/lib:$DYLD_LIBRARY_PATH\n")
         return printers
     
-    for device in devices:
+    # Devices from known printer vendors go first (cheap integer test), but
+    # several of those VIDs are also used by dev boards and serial adapters,
+    # so the rest are still matched by name: a printer from another vendor
+    # must not be hidden behind them.
+    known = [device for device in devices if device.idVendor in THERMAL_VIDS]
+    others = [device for device in devices if device.idVendor not in THERMAL_VIDS]
+    for device in known + others:
         try:
             vendor_id = device.idVendor
             product_id = device.idProduct
             
             try:
-                manufacturer = usb.util.get_string(device, device.iManufacturer) or "Unknown"
-            except:
+                manufacturer = _cached_get_string(device, device.iManufacturer) or "Unknown"
+            except STRING_ERRORS:
                 manufacturer = "Unknown"
             
             try:
-                product = usb.util.get_string(device, device.iProduct) or "Unknown"
-            except:
+                product = _cached_get_string(device, device.iProduct) or "Unknown"
+            except STRING_ERRORS:
                 product = "Unknown"
             
-            # Common thermal printer vendor IDs
-            thermal_vendors = {
-                0x0416: "RONGTA",
-                0x0483: "STMicroelectronics (common for thermal printers)",
-                0x04B8: "Epson",
-                0x0525: "Generic Thermal Printer",
-                0x1504: "RONGTA",
-                0x0FE6: "Generic Printer",
-                0x1FC9: "NXP (common for thermal printers)",
-                0x28E9: "RONGTA",
-                0x1A86: "QinHeng (common for thermal printers)",
-            }
-            
-            is_printer = vendor_id in thermal_vendors or "printer" in product.lower()
+            # Known vendor IDs need no string checks at all
+            if vendor_id in THERMAL_VIDS:
+                is_printer = True
+            else:
+                product_lc = product.lower()
+                is_printer = ("printer" in product_lc or "rongta" in product_lc
+                              or "rongta" in manufacturer.lower())
             
-            if is_printer or "rongta" in manufacturer.lower() or "rongta" in product.lower():
+            if is_printer:
                 print(f"✅ FOUND PRINTER:")
                 print(f"   Vendor ID:  0x{vendor_id:04x}")
                 print(f"   Product ID: 0x{product_id:04x}")
@@ -86,14 +307,76 @@ def find_printer():
     
     if not printers:
         print("⚠️  No thermal printers auto-detected. Listing all USB devices:\n")
-        for device in usb.core.find(find_all=True):
+        listing = []
+        for device in devices:  # the list from the scan above; no second enumeration
             try:
-                product = usb.util.get_string(device, device.iProduct) or ""
-            except:
+                product = _cached_get_string(device, device.iProduct) or ""
+            except STRING_ERRORS:
                 product = ""
-            print(f"   Vendor: 0x{device.idVendor:04x}, Product: 0x{device.idProduct:04x} - {product}")
+            listing.append(f"   Vendor: 0x{device.idVendor:04x}, Product: 0x{device.idProduct:04x} - {product}")
+        if listing:
+            print("\n".join(listing))
+    else:
+        _save_cached_printer(*printers[0][:2])
     
-    return printers
+    if signature is not None:
+        _scan_cache = (signature, printers)
+    return list(printers)
+
+
+def _send(data, vendor_id, product_id):
+    """Write a job's ESC/POS bytes (rendered on a Dummy) to the USB printer at once.
+
+    Every python-escpos call (set/text/cut/...) on a Usb printer is its own
+    tiny bulk transfer; rendering on a Dummy first makes the job one.
+    """
+    _get_printer(vendor_id, product_id)._raw(data)
+
+
+def _render_message_chrome():
+    """Render print_message's fixed header and footer to ESC/POS bytes once."""
+    head = Dummy()
+    # Initialize printer
+    head.set(align='center')
+    head.text("\n")
+    head.text("=" * 32 + "\n")
+    head.text("\n")
+    # Set text properties
+    head.set(align='center', font='a', bold=True, double_height=True, double_width=True)
+    head.text("PHOTOBOOTH\n")
+    head.set(align='center', font='a', bold=False, double_height=False, double_width=False)
+    head.text("\n")
+
+    tail = Dummy()
+    tail.text("\n")
+    tail.text("=" * 32 + "\n")
+    tail.text("\n\n\n")
+    # Cut the paper (if printer supports it)
+    tail.cut()
+    return head.output, tail.output
+
+
+# Only the message itself is encoded per print
+_MESSAGE_HEAD, _MESSAGE_TAIL = _render_message_chrome()
+
+
+@functools.lru_cache(maxsize=256)
+def _encode_message(message):
+    """ESC/POS bytes for a print_message body (stock messages repeat)."""
+    job = Dummy()
+    job.text(message + "\n")
+    return job.output
+
+
+@functools.lru_cache(maxsize=32)
+def _receipt_head(title):
+    """ESC/POS bytes for a receipt's title block (titles repeat a lot)."""
+    head = Dummy()
+    head.set(align='center', bold=True, double_height=True, double_width=True)
+    head.text(f"\n{title}\n")
+    head.set(align='center', bold=False, double_height=False, double_width=False)
+    head.text("=" * 32 + "\n\n")
+    return head.output
 
 
 def print_message(message, vendor_id=0x0416, product_id=0x5011):
@@ -106,39 +389,15 @@ def print_message(message, vendor_id=0x0416, product_id=0x5011):
         product_id: USB Product ID (default 0x5011, common for RONGTA)
     """
     try:
-        # Connect to the printer via USB
-        printer = Usb(vendor_id, product_id)
-        
-        # Initialize printer
-        printer.set(align='center')
-        
-        # Print the message
-        printer.text("\n")
-        printer.text("=" * 32 + "\n")
-        printer.text("\n")
+        # Encode just the message; the header/footer are prerendered
+        _send(_MESSAGE_HEAD + _encode_message(message) + _MESSAGE_TAIL,
+              vendor_id, product_id)
         
-        # Set text properties
-        printer.set(align='center', font='a', bold=True, double_height=True, double_width=True)
-        printer.text("PHOTOBOOTH\n")
-        
-        printer.set(align='center', font='a', bold=False, double_height=False, double_width=False)
-        printer.text("\n")
-        printer.text(message + "\n")
-        printer.text("\n")
-        printer.text("=" * 32 + "\n")
-        printer.text("\n\n\n")
-        
-        # Cut the paper (if printer supports it)
-        try:
-            printer.cut()
-        except:
-            pass
-        
-        printer.close()
         print(f"✅ Message printed successfully!")
         return True
         
     except usb.core.USBError as e:
+        _drop_printer(vendor_id, product_id)
         if "Access denied" in str(e) or "Resource busy" in str(e):
             print(f"❌ USB Access Error: {e}")
             print("   Try unplugging and replugging the printer,")
@@ -147,6 +406,7 @@ def print_message(message, vendor_id=0x0416, product_id=0x5011):
             print(f"❌ USB Error: {e}")
         return False
     except Exception as e:
+        _drop_printer(vendor_id, product_id)
         print(f"❌ Error printing: {e}")
         return False
 
@@ -163,41 +423,70 @@ def print_receipt(title, lines, footer=None, vendor_id=0x0416, product_id=0x5011
         product_id: USB Product ID
     """
     try:
-        printer = Usb(vendor_id, product_id)
-        
-        # Header
-        printer.set(align='center', bold=True, double_height=True, double_width=True)
-        printer.text(f"\n{title}\n")
-        printer.set(align='center', bold=False, double_height=False, double_width=False)
-        printer.text("=" * 32 + "\n\n")
-        
         # Content
-        printer.set(align='left')
-        for line in lines:
-            printer.text(f"{line}\n")
+        job = Dummy()
+        job.set(align='left')
+        if lines:
+            job.text("\n".join(map(str, lines)) + "\n")  # encoded in one pass
         
         # Footer
         if footer:
-            printer.text("\n" + "-" * 32 + "\n")
-            printer.set(align='center')
-            printer.text(f"{footer}\n")
+            job.text("\n" + "-" * 32 + "\n")
+            job.set(align='center')
+            job.text(f"{footer}\n")
         
-        printer.text("\n\n\n")
+        job.text("\n\n\n")
         
         try:
-            printer.cut()
-        except:
+            job.cut()
+        except NotImplementedError:
             pass
         
-        printer.close()
+        # Header (rendered once per title) + body in one write
+        _send(_receipt_head(title) + job.output, vendor_id, product_id)
         print(f"✅ Receipt printed successfully!")
         return True
         
     except Exception as e:
+        _drop_printer(vendor_id, product_id)
         print(f"❌ Error printing receipt: {e}")
         return False
 
 
+def _raster_image(image_path):
+    """Dither an image to a packed 1-bit dot array (one bit per dot, MSB first).
+
+    Same pipeline as python-escpos' EscposImage (flatten onto white, gray,
+    invert, then dither, so the error diffusion runs on the inverted image),
+    but dithered once as a whole: printer.image() re-processes every
+    960-row fragment from the original, so taller images differ from it
+    along the fragment seams.
+    """
+    with Image.open(image_path) as img:
+        if img.mode in ("RGBA", "LA", "PA") or "transparency" in img.info:
+            # Flatten transparency onto white paper, as escpos does
+            rgba = img.convert("RGBA")
+            rgb = Image.new("RGB", img.size, (255, 255, 255))
+            rgb.paste(rgba, mask=rgba.getchannel("A"))
+            gray = rgb.convert("L")
+        else:
+            gray = img.convert("L")
+    dots = np.asarray(ImageOps.invert(gray).convert("1"))  # True = print a dot
+    return np.packbits(dots, axis=1)  # rows padded to whole bytes with white
+
+
+def _raster_fragments(packed):
+    """Yield GS v 0 raster commands for a packed image, one per fragment.
+
+    Same command layout as python-escpos' printer.image() (bitImageRaster).
+    """
+    height, width_bytes = packed.shape
+    for top in range(0, height, RASTER_FRAGMENT_ROWS):
+        fragment = packed[top:top + RASTER_FRAGMENT_ROWS]
+        yield (GS + b"v0\x00" + struct.pack("<HH", width_bytes, len(fragment))
+               + fragment.tobytes())
+
+
 def print_image(image_path, vendor_id=0x0416, product_id=0x5011):
     """
     Print an image to the thermal printer.
@@ -208,28 +497,45 @@ def print_image(image_path, vendor_id=0x0416, product_id=0x5011):
         product_id: USB Product ID
     """
     try:
-        from PIL import Image
-        
-        printer = Usb(vendor_id, product_id)
-        
-        # Print the image
-        printer.image(image_path)
-        printer.text("\n\n\n")
+        job = Dummy()
+        job.text("\n\n\n")
         
         try:
-            printer.cut()
-        except:
+            job.cut()
+        except NotImplementedError:
             pass
         
-        printer.close()
+        # Print the image: one bulk write per raster fragment, so only one
+        # fragment's bytes exist at a time however tall the image is
+        packed = _raster_image(image_path)
+        printer = _get_printer(vendor_id, product_id)
+        for fragment in _raster_fragments(packed):
+            printer._raw(fragment)
+        printer._raw(job.output)
         print(f"✅ Image printed successfully!")
         return True
         
     except Exception as e:
+        _drop_printer(vendor_id, product_id)
         print(f"❌ Error printing image: {e}")
         return False
 
 
+# One worker: jobs queue in order and never share a Usb handle concurrently
+# (its thread only starts on the first submit)
+_print_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="thermal")
+
+
+def print_async(print_func, *args, **kwargs):
+    """Run print_message/print_receipt/print_image on a background worker.
+
+    Returns a concurrent.futures.Future resolving to the print function's
+    result, so the caller can prepare the next job while this one drains
+    over USB (pyusb releases the GIL during the transfer).
+    """
+    return _print_executor.submit(print_func, *args, **kwargs)
+
+
 # Default RONGTA vendor/product IDs to try
 RONGTA_IDS = [
     (0x0416, 0x5011),  # Common RONGTA
@@ -240,12 +546,35 @@ RONGTA_IDS = [
 ]
 
 
+def _attached_ids(candidates):
+    """Return the (vendor_id, product_id) candidates present on the bus.
+
+    One bus enumeration for all of them, instead of a failed Usb open per
+    absent candidate. Keeps the candidates' order.
+    """
+    try:
+        present = {(d.idVendor, d.idProduct) for d in usb.core.find(find_all=True)}
+    except usb.core.NoBackendError:
+        return []
+    return [ids for ids in candidates if ids in present]
+
+
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="RONGTA thermal printer test")
+    parser.add_argument("--chunk-size", type=int, default=WRITE_CHUNK_SIZE,
+                        help=f"USB bulk write chunk in bytes (default {WRITE_CHUNK_SIZE})")
+    WRITE_CHUNK_SIZE = max(1, parser.parse_args().chunk_size)
+
     print("🖨️  RONGTA Thermal Printer Test\n")
     print("-" * 40)
     
-    # First, find connected printers
-    printers = find_printer()
+    # Reuse the printer found last time if it is still plugged in (a targeted
+    # find skips the string-descriptor reads of a full scan); otherwise scan
+    cached = load_cached_printer()
+    if cached and usb.core.find(idVendor=cached[0], idProduct=cached[1]) is not None:
+        printers = [(*cached, "cached from last scan")]
+    else:
+        printers = find_printer()
     
     if printers:
         vendor_id, product_id, desc = printers[0]
@@ -267,7 +596,10 @@ if __name__ == "__main__":
         
         # Try default RONGTA IDs
         print("🔄 Attempting with common RONGTA IDs...")
-        for vid, pid in RONGTA_IDS:
+        attached = _attached_ids(RONGTA_IDS)
+        if not attached:
+            print("   None of them are connected.")
+        for vid, pid in attached:
             print(f"   Trying 0x{vid:04x}, 0x{pid:04x}...", end=" ")
             if print_message("Hello from Python!\nThis is a test print.", vid, pid):
                 break